@@ -1,7 +1,22 @@
+import argparse
+import codecs
 import json
+import re
 import chardet
 from pathlib import Path
 
+# Parseur JSON rapide optionnel : orjson, sinon simdjson, sinon le module json standard
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+JSON_BACKEND = 'orjson' if orjson else 'simdjson' if simdjson else 'json'
+
 # Répertoire du script (dynamique)
 base_dir = Path(__file__).resolve().parent
 
@@ -10,49 +25,297 @@ filename = base_dir / 'DataModelSchema.txt'
 output_filename = base_dir / 'fichier_converti.json'
 
 
+# Taille du préfixe examiné pour le BOM et le motif d'octets nuls
+SNIFF_SIZE = 4096
+# Taille maximale de l'échantillon confié à chardet en dernier recours
+CHARDET_SAMPLE_SIZE = 64 * 1024
+# Confiance minimale de chardet pour un repli après un échec de décodage
+CHARDET_MIN_CONFIDENCE = 0.5
+
+# Encodages que les parseurs lisent directement en octets, sans décodage préalable
+UTF8_ENCODINGS = ('utf-8', 'utf-8-sig', 'ascii')
+
+# BOM connus, du plus long au plus court (le BOM UTF-32 LE commence comme celui d'UTF-16 LE)
+BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+
+def _sniff_null_pattern(prefix):
+    """
+    Déduit l'encodage de la position des octets nuls : un JSON commence par de
+    l'ASCII, donc en UTF-16/32 un caractère sur deux (ou trois octets sur quatre) est nul.
+    """
+    n = len(prefix) // 4
+    if n:
+        quads = [prefix[i:n * 4:4].count(0) for i in range(4)]
+        # Plan multilingue de base : les deux octets de poids fort sont toujours nuls
+        if quads[2] == quads[3] == n and quads[0] < n:
+            return 'utf-32-le'
+        if quads[0] == quads[1] == n and quads[3] < n:
+            return 'utf-32-be'
+    half = len(prefix) // 2
+    even = prefix[0:half * 2:2].count(0)
+    odd = prefix[1:half * 2:2].count(0)
+    # Les caractères ASCII (majoritaires dans un JSON) ont leur octet nul du même côté
+    if half and odd >= half * 0.5 and even <= odd * 0.1:
+        return 'utf-16-le'
+    if half and even >= half * 0.5 and odd <= even * 0.1:
+        return 'utf-16-be'
+    return None
+
 def detect_encoding(raw_data):
-    result = chardet.detect(raw_data)
-    return result.get('encoding')
+    """
+    Détecte l'encodage à partir des octets bruts, du plus rapide au plus coûteux :
+    BOM, motif d'octets nuls du préfixe, UTF-8 strict du préfixe, puis chardet sur
+    un échantillon borné. Retourne (encodage, méthode).
+    """
+    for bom, encoding in BOMS:
+        if raw_data.startswith(bom):
+            return encoding, 'BOM'
 
-def try_load_with_encoding(path, encoding):
+    prefix = raw_data[:SNIFF_SIZE]
+    encoding = _sniff_null_pattern(prefix)
+    if encoding:
+        return encoding, 'octets nuls'
+
+    if 0 not in prefix:
+        try:
+            # Décodeur incrémental : un caractère coupé en fin de préfixe n'est pas une erreur
+            codecs.getincrementaldecoder('utf-8')().decode(prefix, final=False)
+            return 'utf-8', 'UTF-8 strict'
+        except UnicodeDecodeError:
+            pass
+
+    sample = raw_data[:CHARDET_SAMPLE_SIZE]
+    encoding = chardet.detect(sample).get('encoding') or 'latin-1'
+    return encoding, f'chardet ({len(sample)} octets)'
+
+def loads(data):
+    """
+    Désérialise du JSON (str ou octets UTF-8) avec le parseur actif (JSON_BACKEND).
+    Lève ValueError si le JSON est invalide, quel que soit le parseur.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if simdjson is not None:
+        return simdjson.loads(data)
+    return json.loads(data)
+
+def dumps(obj):
+    """Sérialise en JSON compact (str, caractères non ASCII conservés) avec le parseur actif."""
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+def _fallback_encodings(raw, encoding, error):
+    """
+    Encodages de repli après un échec de décodage strict (la détection n'examine
+    qu'un préfixe) : chardet sur un échantillon borné autour de l'octet invalide,
+    s'il est assez confiant, puis, pour un texte pris pour de l'UTF-8, cp1252 et latin-1.
+    """
+    start = max(0, error.start - CHARDET_SAMPLE_SIZE // 2)
+    result = chardet.detect(raw[start:start + CHARDET_SAMPLE_SIZE])
+    detected = result.get('encoding')
+    if detected and detected.lower() != encoding and (result.get('confidence') or 0) >= CHARDET_MIN_CONFIDENCE:
+        yield detected
+    if encoding in UTF8_ENCODINGS:
+        yield from ('cp1252', 'latin-1')
+
+def decode_text(raw, encoding):
+    """Décode les octets une seule fois avec l'encodage donné (ou, en cas d'échec, un encodage de repli)."""
     try:
-        text = path.read_text(encoding=encoding, errors='replace')
-        return json.loads(text)
-    except Exception as e:
-        print(f"→ échec avec {encoding!r} : {e}")
+        return raw.decode(encoding)
+    except LookupError:
+        print(f"→ encodage {encoding!r} inconnu, repli sur 'latin-1'")
+        return raw.decode('latin-1')
+    except UnicodeDecodeError as e:
+        for fallback in _fallback_encodings(raw, encoding, e):
+            try:
+                text = raw.decode(fallback)
+            except (LookupError, UnicodeDecodeError):
+                continue
+            print(f"→ décodage strict impossible avec {encoding!r} ({e}), repli sur {fallback!r}")
+            return text
+        print(f"→ décodage strict impossible avec {encoding!r} ({e}), caractères invalides remplacés")
+        return raw.decode(encoding, errors='replace')
+
+def decode_bytes(raw):
+    """Décode les octets une seule fois avec l'encodage détecté."""
+    encoding, method = detect_encoding(raw)
+    print(f"Encodage détecté ({method}) : {encoding!r}")
+    return decode_text(raw, encoding)
+
+def decode_json(raw):
+    """
+    Décode le JSON à partir d'octets bruts : une détection d'encodage et un seul
+    passage du parseur actif. En UTF-8, les octets sont passés tels quels au
+    parseur ; sinon ils sont décodés une fois. Lève SystemExit en cas d'échec.
+    """
+    encoding, method = detect_encoding(raw)
+    print(f"Encodage détecté ({method}) : {encoding!r} — parseur JSON : {JSON_BACKEND}")
+    if encoding in UTF8_ENCODINGS:
+        try:
+            return loads(raw[len(codecs.BOM_UTF8):] if raw.startswith(codecs.BOM_UTF8) else raw)
+        except ValueError:
+            # UTF-8 invalide plus loin dans le fichier ou JSON invalide : voir ci-dessous
+            pass
+    text = decode_text(raw, encoding)
+    try:
+        return loads(text)
+    except ValueError as e:
+        print(f"\nÉchec de la désérialisation JSON : {e}")
+        print("Extrait (500 premiers caractères) :")
+        print(text[:500])
+        raise SystemExit("Impossible de parser le JSON.")
+
+# ——— Lecture en flux de model.tables ———
+# Balayage minimal du texte JSON : les membres inutiles (annotations, relations,
+# cultures…) sont sautés sans être construits, et model.tables est désérialisé
+# élément par élément.
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+_STRUCTURE = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}]', re.S)
+_SCALAR = re.compile(r'[^,\]}\s]+')
+
+
+def _skip_ws(text, pos):
+    return _WHITESPACE.match(text, pos).end()
+
+def _expect(text, pos, chars):
+    if pos >= len(text) or text[pos] not in chars:
+        raise ValueError(f"{chars!r} attendu à la position {pos}")
+
+def _skip_value(text, pos):
+    """Position juste après la valeur JSON commençant à pos, sans la construire."""
+    first = text[pos:pos + 1]
+    if first == '"':
+        match = _STRING.match(text, pos)
+    elif first not in ('{', '['):
+        match = _SCALAR.match(text, pos)
+    else:
+        depth = 0
+        for match in _STRUCTURE.finditer(text, pos):
+            token = match.group()[0]
+            if token in '{[':
+                depth += 1
+            elif token in '}]':
+                depth -= 1
+                if depth == 0:
+                    return match.end()
+        match = None
+    if match is None:
+        raise ValueError(f"valeur JSON invalide ou tronquée à la position {pos}")
+    return match.end()
+
+def _find_member(text, pos, name):
+    """Position de la valeur du membre name de l'objet commençant à pos (None s'il est absent)."""
+    _expect(text, pos, '{')
+    pos = _skip_ws(text, pos + 1)
+    if text.startswith('}', pos):
         return None
+    while True:
+        _expect(text, pos, '"')
+        key, pos = json.decoder.scanstring(text, pos + 1)
+        pos = _skip_ws(text, pos)
+        _expect(text, pos, ':')
+        pos = _skip_ws(text, pos + 1)
+        if key == name:
+            return pos
+        pos = _skip_ws(text, _skip_value(text, pos))
+        _expect(text, pos, ',}')
+        if text[pos] == '}':
+            return None
+        pos = _skip_ws(text, pos + 1)
 
-# 1. Lire en binaire et détecter
-raw = filename.read_bytes()
-detected = detect_encoding(raw)
-print(f"Encodage détecté (chardet) : {detected!r}")
-
-# 2. Liste d'encodages à tester
-encodings_to_try = []
-if detected:
-    encodings_to_try.append(detected)
-encodings_to_try += ['utf-8-sig', 'utf-8', 'utf-16', 'cp1252', 'latin-1']
-
-# 3. Tenter de charger
-data = None
-for enc in encodings_to_try:
-    data = try_load_with_encoding(filename, enc)
-    if data is not None:
-        print(f"→ succès avec {enc!r}")
-        break
-
-# 4. Si échec total, afficher un extrait brut pour debug
-if data is None:
-    print("\nÉchec de la désérialisation JSON avec tous les encodages testés.")
-    snippet = filename.read_text(encoding=encodings_to_try[-1], errors='replace')[:500]
-    print("Extrait (500 premiers caractères) :")
-    print(snippet)
-    raise SystemExit("Impossible de parser le JSON.")
-
-# 5. Sauvegarder en UTF-8 sans BOM
-try:
-    with open(output_filename, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
-    print(f"Fichier converti et sauvegardé sous : {output_filename}")
-except Exception as e:
-    print(f"Erreur lors de l’enregistrement : {e}")
+def _iter_array(text, pos, member):
+    """
+    Désérialise un à un les éléments du tableau commençant à pos et produit
+    (member, élément) ; retourne la position qui suit le tableau.
+    """
+    _expect(text, pos, '[')
+    pos = _skip_ws(text, pos + 1)
+    if text.startswith(']', pos):
+        return pos + 1
+    while True:
+        # Étendue de l'élément repérée sans le construire, puis désérialisée par le parseur actif
+        end = _skip_value(text, pos)
+        yield member, loads(text[pos:end])
+        pos = end
+        pos = _skip_ws(text, pos)
+        _expect(text, pos, ',]')
+        if text[pos] == ']':
+            return pos + 1
+        pos = _skip_ws(text, pos + 1)
+
+def _iter_members(text, pos, members):
+    """(membre, élément) des tableaux members de l'objet commençant à pos ; les autres membres sont sautés."""
+    _expect(text, pos, '{')
+    pos = _skip_ws(text, pos + 1)
+    if text.startswith('}', pos):
+        return
+    while True:
+        _expect(text, pos, '"')
+        key, pos = json.decoder.scanstring(text, pos + 1)
+        pos = _skip_ws(text, pos)
+        _expect(text, pos, ':')
+        pos = _skip_ws(text, pos + 1)
+        if key in members and text.startswith('[', pos):
+            pos = yield from _iter_array(text, pos, key)
+        else:
+            pos = _skip_value(text, pos)
+        pos = _skip_ws(text, pos)
+        _expect(text, pos, ',}')
+        if text[pos] == '}':
+            return
+        pos = _skip_ws(text, pos + 1)
+
+def iter_model_items(raw, members=('tables', 'relationships')):
+    """
+    Parcourt les tableaux members de model (tables, relations) élément par
+    élément et produit (membre, élément), à partir des octets bruts ou du texte
+    déjà décodé, sans construire l'arbre JSON complet : chaque élément est
+    désérialisé seul par le parseur actif (voir loads). Les objets JSON
+    désérialisés restent bornés par le plus gros élément, mais le texte décodé
+    complet reste en mémoire pendant tout le parcours ; le Model construit à
+    partir des éléments (autodoc.extract_model) est, lui, complet.
+    Lève SystemExit si le JSON est invalide.
+    """
+    text = raw if isinstance(raw, str) else decode_bytes(raw)
+    pos = _skip_ws(text, 1 if text.startswith('\ufeff') else 0)
+    try:
+        pos = _find_member(text, pos, 'model')
+        if pos is not None:
+            yield from _iter_members(text, pos, members)
+    except ValueError as e:
+        print(f"\nÉchec de la lecture en flux du JSON : {e}")
+        print("Extrait (500 premiers caractères) :")
+        print(text[:500])
+        raise SystemExit("Impossible de parser le JSON.")
+
+def load_schema(path):
+    """Lit le fichier DataModelSchema et retourne le modèle désérialisé."""
+    return decode_json(Path(path).read_bytes())
+
+def save_json(data, path, compact=False):
+    """Sauvegarde en UTF-8 sans BOM, indentée (lisible) ou compacte (plus rapide et plus petite)."""
+    try:
+        with open(path, 'w', encoding='utf-8') as f:
+            if compact:
+                f.write(dumps(data))
+            else:
+                json.dump(data, f, ensure_ascii=False, indent=4)
+        print(f"Fichier converti et sauvegardé sous : {path}")
+    except Exception as e:
+        print(f"Erreur lors de l’enregistrement : {e}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convertit DataModelSchema.txt en fichier_converti.json (UTF-8)")
+    parser.add_argument('--compact', action='store_true', help="JSON compact au lieu de l'indentation lisible")
+    args = parser.parse_args()
+    save_json(load_schema(filename), output_filename, compact=args.compact)
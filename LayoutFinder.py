@@ -1,98 +1,246 @@
-import zipfile
-import shutil
-import json
-import chardet
+from functools import cached_property
 from pathlib import Path
 import argparse
 
+from EncodeJSON import decode_json, loads, save_json
+from UnzipPBIP import LAYOUT_MEMBER, PbitArchive, find_pbit
+
 # 📁 Répertoire dynamique : dossier où se trouve ce script
 DEFAULT_ROOT = Path(__file__).resolve().parent
 
-def detect_encoding(raw_data):
-    """Détecte l'encodage à partir d'octets bruts."""
-    result = chardet.detect(raw_data)
-    return result.get('encoding')
-
-def try_load_with_encoding(path, encoding):
-    """Tente de charger un JSON avec un encodage donné."""
-    try:
-        text = path.read_text(encoding=encoding, errors='replace')
-        return json.loads(text)
-    except Exception as e:
-        print(f"→ Échec avec {encoding!r} : {e}")
+def extract_layout_bytes(root_dir: Path):
+    """Lit le Layout brut du premier .pbit de root_dir, sans copie ni extraction, et retourne ses octets (ou None)."""
+    original_pbit = find_pbit(root_dir)
+    if original_pbit is None:
         return None
-
-def extract_and_clean_layout(root_dir: Path):
-    """Extrait le Layout d'un .pbit, le décode proprement et le sauvegarde en JSON."""
-    pbit_files = list(root_dir.glob("*.pbit"))
-    if not pbit_files:
-        print(f"Aucun fichier .pbit trouvé dans {root_dir}")
-        return
-
-    original_pbit = pbit_files[0]
     print(f"Fichier .pbit détecté : {original_pbit.name}")
 
-    copy_pbit = original_pbit.with_name(original_pbit.stem + "_Originale.pbit")
-    zip_file = copy_pbit.with_suffix(".zip")
-    extract_folder = root_dir / original_pbit.stem
-
-    # Copie et renommage
-    shutil.copy(original_pbit, copy_pbit)
-    if zip_file.exists():
-        zip_file.unlink()
-    copy_pbit.rename(zip_file)
-
-    # Extraction partielle : uniquement Layout
-    layout_file_found = None
-    with zipfile.ZipFile(zip_file, "r") as zip_ref:
-        for member in zip_ref.infolist():
-            if "Report/Layout" in member.filename.replace("\\", "/"):
-                layout_file_found = member.filename
-                zip_ref.extract(member, extract_folder)
-                break
-
-    if not layout_file_found:
+    with PbitArchive(original_pbit) as archive:
+        raw = archive.read(LAYOUT_MEMBER)
+    if raw is None:
         print("Fichier Layout non trouvé dans le .pbit")
-        return
+    else:
+        print(f"Layout lu : {LAYOUT_MEMBER} ({len(raw)} octets)")
+    return raw
 
-    layout_path = extract_folder / layout_file_found
-    print(f"Layout extrait : {layout_path.name}")
+def decode_layout(raw):
+    """Décode le Layout brut en JSON (détection rapide d'encodage, un seul décodage)."""
+    return decode_json(raw)
 
-    # Détection d'encodage
-    raw = layout_path.read_bytes()
-    detected = detect_encoding(raw)
-    print(f"Encodage détecté (chardet) : {detected!r}")
+def decode_nested(value):
+    """
+    Décode une charge JSON imbriquée du Layout (config, filters, query… sont
+    stockés sous forme de chaînes). Une valeur déjà décodée est renvoyée telle
+    quelle, une valeur absente donne None. Lève ValueError si la chaîne est invalide.
+    """
+    if value is None or not isinstance(value, (str, bytes)):
+        return value
+    return loads(value) if value else None
 
-    encodings_to_try = [detected] if detected else []
-    encodings_to_try += ['utf-8-sig', 'utf-8', 'utf-16', 'utf-16-le', 'utf-16-be', 'cp1252', 'latin-1']
+def iter_field_refs(node, aliases=None):
+    """
+    Parcourt une expression de requête du Layout et produit (table, champ, type)
+    pour chaque référence à une colonne, une mesure ou un niveau de hiérarchie.
+    aliases associe les alias de la clause From (« v ») au nom de la table.
+    """
+    aliases = aliases or {}
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, list):
+            stack.extend(item)
+            continue
+        if not isinstance(item, dict):
+            continue
+        for kind in ('Column', 'Measure', 'HierarchyLevel'):
+            ref = item.get(kind)
+            if isinstance(ref, dict):
+                entity = _source_entity(ref.get('Expression'), aliases)
+                prop = ref.get('Property') or ref.get('Level')
+                if entity and prop:
+                    yield entity, prop, kind
+        stack.extend(v for v in item.values() if isinstance(v, (dict, list)))
 
-    data = None
-    for enc in encodings_to_try:
-        data = try_load_with_encoding(layout_path, enc)
-        if data is not None:
-            print(f"→ Succès avec {enc!r}")
-            break
+def _source_entity(expression, aliases):
+    """Table désignée par une expression SourceRef (directement ou via un alias)."""
+    while isinstance(expression, dict):
+        source_ref = expression.get('SourceRef')
+        if isinstance(source_ref, dict):
+            return source_ref.get('Entity') or aliases.get(source_ref.get('Source'))
+        # Hiérarchies : {"Hierarchy": {"Expression": {"SourceRef": ...}}}
+        inner = expression.get('Hierarchy') or expression.get('PropertyVariationSource')
+        expression = inner.get('Expression') if isinstance(inner, dict) else None
+    return None
 
-    if data is None:
-        print("\n❌ Impossible de parser le JSON avec tous les encodages testés.")
-        snippet = layout_path.read_text(encoding=encodings_to_try[-1], errors='replace')[:500]
-        print("Extrait (500 premiers caractères) :")
-        print(snippet)
-        raise SystemExit("Échec de lecture JSON.")
 
-    # Sauvegarde propre
-    dest_json = root_dir / "Layout.json"
-    with open(dest_json, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
-    print(f"✅ Fichier Layout converti et sauvegardé sous : {dest_json}")
+class Visual:
+    """
+    Visuel d'une page. Les charges config, filters, query et dataTransforms
+    sont décodées à la première lecture puis mémorisées.
+    """
+
+    def __init__(self, container, page):
+        self._container = container
+        self.page = page
+
+    @property
+    def position(self):
+        c = self._container
+        return c.get('x'), c.get('y'), c.get('width'), c.get('height')
+
+    @cached_property
+    def config(self):
+        return decode_nested(self._container.get('config')) or {}
+
+    @cached_property
+    def filters(self):
+        return decode_nested(self._container.get('filters')) or []
+
+    @cached_property
+    def query(self):
+        return decode_nested(self._container.get('query')) or {}
+
+    @cached_property
+    def data_transforms(self):
+        return decode_nested(self._container.get('dataTransforms')) or {}
+
+    @property
+    def name(self):
+        return self.config.get('name')
+
+    @property
+    def visual_type(self):
+        return (self.config.get('singleVisual') or {}).get('visualType')
+
+    @cached_property
+    def fields(self):
+        """Champs projetés par le visuel : liste de (table, champ, type), sans doublon."""
+        prototype = (self.config.get('singleVisual') or {}).get('prototypeQuery') or {}
+        aliases = {f.get('Name'): f.get('Entity') for f in prototype.get('From', [])}
+        return list(dict.fromkeys(iter_field_refs(prototype.get('Select', []), aliases)))
+
+    @cached_property
+    def filter_fields(self):
+        """Champs utilisés par les filtres du visuel : liste de (table, champ, type)."""
+        return list(dict.fromkeys(iter_field_refs(self.filters)))
+
+
+class Page:
+    """Page (section) du rapport ; config, filtres et visuels sont décodés à la demande."""
+
+    def __init__(self, section):
+        self._section = section
+        self.name = section.get("name", "Inconnu")
+        self.display_name = section.get("displayName", "Sans nom")
+
+    @cached_property
+    def config(self):
+        return decode_nested(self._section.get("config")) or {}
+
+    @cached_property
+    def filters(self):
+        return decode_nested(self._section.get("filters")) or []
+
+    @cached_property
+    def visuals(self):
+        return [Visual(c, self) for c in self._section.get("visualContainers", [])]
+
+    @property
+    def visibility(self):
+        """Libellé de visibilité de la page (à partir de sa config)."""
+        if not self._section.get("config"):
+            return "Non défini (None)"
+        try:
+            vis_val = self.config.get("visibility")
+        except ValueError:
+            return "Erreur JSON"
+        if vis_val == 0:
+            return "Visible"
+        if vis_val == 1:
+            return "Masquée"
+        return f"Non défini ({vis_val})"
+
+
+class LayoutModel:
+    """
+    Vue paresseuse du Layout : pages et visuels sont listés sans décoder leurs
+    chaînes JSON imbriquées, qui ne le sont qu'au premier accès.
+    """
+
+    def __init__(self, layout):
+        self._layout = layout
+        self.pages = [Page(section) for section in layout.get("sections", [])]
+
+    @cached_property
+    def config(self):
+        return decode_nested(self._layout.get("config")) or {}
+
+    @cached_property
+    def filters(self):
+        return decode_nested(self._layout.get("filters")) or []
+
+    def visuals(self):
+        """Tous les visuels du rapport, page par page."""
+        for page in self.pages:
+            yield from page.visuals
+
+def extract_pages(layout):
+    """Retourne la liste des pages du rapport avec leur visibilité."""
+    if not isinstance(layout, LayoutModel):
+        layout = LayoutModel(layout)
+    return [
+        {"Nom de la page": page.display_name, "ID de la page": page.name, "Visibilité": page.visibility}
+        for page in layout.pages
+    ]
+
+def _visual_label(visual):
+    visual_type = visual.visual_type or "visuel"
+    return f"{visual_type} ({visual.name})" if visual.name else visual_type
+
+def extract_field_usages(layout):
+    """
+    Champs du modèle utilisés par le rapport, en un seul parcours du Layout :
+    liste de [table, champ, type, page, visuel, rôle], où type vaut 'Column',
+    'Measure' ou 'HierarchyLevel' et rôle 'visuel' (projection), 'filtre de visuel',
+    'filtre de page' ou 'filtre de rapport'. Une charge JSON illisible est ignorée.
+    """
+    if not isinstance(layout, LayoutModel):
+        layout = LayoutModel(layout)
+    usages = []
+
+    def add(refs, page, visual, role):
+        usages.extend([table, field, kind, page, visual, role] for table, field, kind in refs)
 
-    # Nettoyage
     try:
-        if zip_file.exists(): zip_file.unlink()
-        if copy_pbit.exists(): copy_pbit.unlink()
-        if extract_folder.exists(): shutil.rmtree(extract_folder)
-    except Exception as e:
-        print(f"Avertissement suppression fichiers temporaires : {e}")
+        add(dict.fromkeys(iter_field_refs(layout.filters)), "", "", "filtre de rapport")
+    except ValueError:
+        print("Filtres du rapport illisibles : ignorés")
+    for page in layout.pages:
+        try:
+            add(dict.fromkeys(iter_field_refs(page.filters)), page.display_name, "", "filtre de page")
+        except ValueError:
+            print(f"Filtres de la page {page.display_name!r} illisibles : ignorés")
+        for visual in page.visuals:
+            try:
+                label = _visual_label(visual)
+                add(visual.fields, page.display_name, label, "visuel")
+                add(visual.filter_fields, page.display_name, label, "filtre de visuel")
+            except ValueError:
+                print(f"Visuel illisible sur la page {page.display_name!r} : ignoré")
+    return usages
+
+def extract_and_clean_layout(root_dir: Path, compact=False):
+    """Extrait le Layout d'un .pbit, le décode proprement et le sauvegarde en JSON."""
+    raw = extract_layout_bytes(root_dir)
+    if raw is None:
+        return None
+
+    data = decode_layout(raw)
+
+    # Sauvegarde propre
+    dest_json = root_dir / "Layout.json"
+    save_json(data, dest_json, compact=compact)
+    return data
 
 def main():
     parser = argparse.ArgumentParser(description="Extraction et conversion du Layout d’un fichier .pbit")
@@ -102,13 +250,14 @@ def main():
         default=None,
         help="Chemin vers le dossier contenant le .pbit (facultatif)"
     )
+    parser.add_argument('--compact', action='store_true', help="JSON compact au lieu de l'indentation lisible")
     args = parser.parse_args()
     root_path = Path(args.root_dir) if args.root_dir else DEFAULT_ROOT
 
     if not root_path.is_dir():
         print(f"Le chemin spécifié n’est pas un dossier valide : {root_path}")
     else:
-        extract_and_clean_layout(root_path)
+        extract_and_clean_layout(root_path, compact=args.compact)
 
 if __name__ == "__main__":
     main()
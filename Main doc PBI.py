@@ -1,43 +1,333 @@
-import subprocess
+import argparse
 import sys
 import time
 from pathlib import Path
 
-def run_python_script(script_path: Path):
-    print(f"\n🚀 Lancement du script : {script_path.name}")
-    start = time.time()
-    try:
-        subprocess.run([sys.executable, str(script_path)], check=True)
-        duration = time.time() - start
-        print(f"✅ Script {script_path.name} terminé en {duration:.2f} secondes.")
-        return duration
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Erreur lors de l'exécution du script {script_path.name}: {e}")
-        return None
+from cache import DEFAULT_MAX_BYTES, KINDS, ResultCache
+from catalog import Catalog
+from diff import load_metadata, run_diff
+from lineage import build_graph, find_node, label, quote_bracket, quote_table
+from EncodeJSON import save_json
+from pipeline import DEBUG_JSON_FORMATS, run_batch, run_pipeline, run_unused
+from renderers import RENDERERS
+from watch import DEFAULT_INTERVAL, Watcher
+import server
 
 # Répertoire racine dynamique (dossier du script)
 root_dir = Path(__file__).resolve().parent
 
-# Liste des scripts à exécuter, chemins relatifs au répertoire racine
-scripts = [
-    root_dir / "UnzipPBIP.py",
-    root_dir / "EncodeJSON.py",
-    root_dir / "autodoc.py",
-    root_dir / "LayoutFinder.py",
-    root_dir / "Table Doc .py"
-]
-
-total_start = time.time()
-durations = {}
-
-# Exécution de chaque script
-for script in scripts:
-    durations[script.name] = run_python_script(script) or 0.0
-
-total_duration = time.time() - total_start
-
-# Résumé
-print("\n📊 Résumé des temps d'exécution :")
-for name, dur in durations.items():
-    print(f"  ⏱️ {name} : {dur:.2f} s")
-print(f"\n🧾 Temps total d'exécution : {total_duration:.2f} s")
+# Sous-commandes ; sans sous-commande, « run » est utilisée
+COMMANDS = ('run', 'batch', 'watch', 'serve', 'cache', 'diff', 'lineage', 'unused', 'search')
+MB = 1024 * 1024
+
+
+def add_debug_json_argument(parser):
+    parser.add_argument(
+        '--debug-json',
+        nargs='?',
+        const='indent',
+        choices=DEBUG_JSON_FORMATS,
+        default=None,
+        help="Écrit aussi fichier_converti.json et Layout.json (pages.json pour un projet PBIP), indentés par défaut, ou 'compact'"
+    )
+
+def add_stream_argument(parser):
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help="Écrit le .docx en flux, section par section (mémoire bornée, pour les très gros modèles)"
+    )
+
+def parse_formats(value):
+    formats = [f.strip() for f in value.split(',') if f.strip()]
+    unknown = [f for f in formats if f not in RENDERERS]
+    if unknown or not formats:
+        raise argparse.ArgumentTypeError(
+            f"format(s) inconnu(s) : {', '.join(unknown) or value!r} (choix : {', '.join(RENDERERS)})"
+        )
+    return formats
+
+def add_format_argument(parser):
+    parser.add_argument(
+        '--format',
+        dest='formats',
+        type=parse_formats,
+        default=['docx'],
+        help=f"Formats de sortie séparés par des virgules, parmi {', '.join(RENDERERS)} (défaut : docx)"
+    )
+
+def add_cache_arguments(parser):
+    parser.add_argument('--cache-dir', default=None, help="Dossier du cache (défaut : ~/.cache/autodoc_pbi)")
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=DEFAULT_MAX_BYTES // MB,
+        help="Taille maximale du cache en Mo, au-delà les entrées les moins utilisées sont supprimées"
+    )
+
+def add_metrics_arguments(parser):
+    parser.add_argument(
+        '--metrics',
+        default=None,
+        help="Ajoute les mesures de chaque étape (temps, CPU, octets, pic mémoire, compteurs) à ce fichier JSON lines"
+    )
+    parser.add_argument(
+        '--profile',
+        nargs='?',
+        const='profiles',
+        default=None,
+        help="Écrit un profil cProfile par étape dans ce dossier (défaut : ./profiles)"
+    )
+
+def add_catalog_argument(parser):
+    parser.add_argument(
+        '--catalog',
+        default=None,
+        help="Écrit aussi les métadonnées du rapport dans ce catalogue SQLite (voir la commande search)"
+    )
+
+def open_cache(args):
+    return ResultCache(args.cache_dir, max_bytes=args.cache_size * MB)
+
+def command_run(args):
+    root_path = Path(args.root_dir) if args.root_dir else root_dir
+
+    total_start = time.time()
+    cache = open_cache(args) if args.cache else None
+    durations = run_pipeline(root_path, debug_json=args.debug_json, cache=cache, stream=args.stream,
+                             formats=args.formats, metrics_path=args.metrics, profile_dir=args.profile,
+                             render_workers=args.render_workers, catalog_path=args.catalog)
+    total_duration = time.time() - total_start
+
+    # Résumé
+    print("\n📊 Résumé des temps d'exécution :")
+    for name, dur in durations.items():
+        print(f"  ⏱️ {name} : {dur:.2f} s")
+    print(f"\n🧾 Temps total d'exécution : {total_duration:.2f} s")
+
+def command_batch(args):
+    cache = open_cache(args) if args.cache else None
+    summary = run_batch(args.sources, output_dir=args.output_dir, workers=args.workers,
+                        debug_json=args.debug_json, cache=cache, stream=args.stream,
+                        formats=args.formats, metrics_path=args.metrics, profile_dir=args.profile,
+                        catalog_path=args.catalog)
+
+    # Résumé
+    seconds = summary['seconds'] or 1e-9
+    print("\n📊 Résumé du traitement par lot :")
+    print(f"  📄 Rapports : {summary['succeeded']}/{summary['reports']} documentés")
+    print(f"  ⏱️ Durée : {summary['seconds']:.2f} s")
+    print(f"  🚀 Débit : {summary['succeeded'] / seconds:.2f} rapport(s)/s, {summary['bytes'] / MB / seconds:.1f} Mo/s")
+    if summary['failed']:
+        print(f"  ❌ Échecs ({len(summary['failed'])}) :")
+        for path, error in summary['failed'].items():
+            print(f"    - {path} : {error}")
+        sys.exit(1)
+
+def command_cache(args):
+    cache = open_cache(args)
+    if args.action == 'clear':
+        print(f"🧹 {cache.clear()} entrée(s) supprimée(s) de {cache.root}")
+        return
+    info = cache.info()
+    print(f"📦 Cache : {info['path']}")
+    for kind in KINDS:
+        print(f"  {kind} : {info[kind]['count']} entrée(s), {info[kind]['bytes'] / MB:.1f} Mo")
+    print(f"  Total : {info['total_bytes'] / MB:.1f} Mo / {info['max_bytes'] / MB:.0f} Mo")
+
+def command_diff(args):
+    output_prefix = Path(args.output) if args.output else Path(args.new).with_name('differences')
+    diff = run_diff(Path(args.old), Path(args.new), output_prefix)
+    print(
+        f"\n🔍 {len(diff['added'])} ajout(s), {len(diff['removed'])} suppression(s), "
+        f"{len(diff['changed'])} modification(s)"
+    )
+
+def command_lineage(args):
+    model = load_metadata(Path(args.source))
+    graph = build_graph(model)
+    node = find_node(model, graph, args.object)
+    if node is None:
+        sys.exit(f"Objet introuvable dans le graphe de dépendances : {args.object}")
+    print(f"🧬 {label(node)} ({graph.edge_count()} dépendance(s) dans le modèle)")
+    for title, nodes in (("Dépend de", graph.upstream(node)), ("Utilisé par", graph.downstream(node))):
+        print(f"\n  {title} ({len(nodes)}) :")
+        for other in nodes:
+            print(f"    - {label(other)}")
+
+def command_unused(args):
+    results = run_unused(args.sources, workers=args.workers)
+    failed = 0
+    for path, result in results.items():
+        if 'error' in result:
+            failed += 1
+            print(f"❌ {Path(path).name} : {result['error']}")
+            continue
+        print(f"\n🗑️ {Path(path).name} : {len(result['measures'])} mesure(s) et "
+              f"{len(result['columns'])} colonne(s) inutilisées")
+        for kind, items in (('Mesure', result['measures']), ('Colonne', result['columns'])):
+            for table, name in items:
+                print(f"    - {kind} : {table}[{name}]")
+    if args.output:
+        save_json(results, Path(args.output))
+        print(f"\nRésultats enregistrés : {args.output}")
+    if failed:
+        sys.exit(1)
+
+def command_search(args):
+    if not Path(args.catalog).is_file():
+        raise SystemExit(f"Catalogue introuvable : {args.catalog}")
+    start = time.perf_counter()
+    with Catalog(args.catalog) as catalog:
+        results = catalog.search(args.text, kind=args.kind, limit=args.limit)
+    elapsed = (time.perf_counter() - start) * 1000
+    reports = {r['path'] for r in results}
+    print(f"🔎 {len(results)} expression(s) dans {len(reports)} rapport(s) contiennent {args.text!r} ({elapsed:.1f} ms)")
+    for r in results:
+        obj = quote_table(r['table']) + quote_bracket(r['name']) if r['table'] else r['name']
+        print(f"  📄 {r['report']} ({r['path']}) — {r['kind']} {obj}")
+    if args.output:
+        save_json(results, Path(args.output))
+        print(f"\nRésultats enregistrés : {args.output}")
+
+def command_watch(args):
+    sources = args.sources or [root_dir]
+    Watcher(sources, output_dir=args.output_dir, interval=args.interval, stream=args.stream,
+            formats=args.formats).run()
+
+def command_serve(args):
+    cache = open_cache(args) if args.cache else None
+    server.serve(args.host, args.port, workers=args.workers, work_dir=args.work_dir, max_queue=args.max_queue,
+                 max_upload_mb=args.max_upload, cache=cache, max_documents=args.max_documents)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Génère la documentation Word d'un fichier .pbit (toutes les étapes, en un seul processus)"
+    )
+    subparsers = parser.add_subparsers(dest='command')
+
+    run_parser = subparsers.add_parser('run', help="Documente le .pbit d'un dossier (commande par défaut)")
+    run_parser.add_argument(
+        'root_dir',
+        nargs='?',
+        default=None,
+        help="Chemin du dossier contenant le .pbit (optionnel)"
+    )
+    add_debug_json_argument(run_parser)
+    add_stream_argument(run_parser)
+    add_format_argument(run_parser)
+    run_parser.add_argument(
+        '--cache',
+        action='store_true',
+        help="Réutilise les résultats des exécutions précédentes (projet PBIP : seuls les fichiers modifiés sont relus)"
+    )
+    add_cache_arguments(run_parser)
+    run_parser.add_argument(
+        '--render-workers',
+        type=int,
+        default=None,
+        metavar='N',
+        help="Construit les sections des tables du .docx dans N processus et l'écrit en flux (gros modèles, plusieurs cœurs)"
+    )
+    add_metrics_arguments(run_parser)
+    add_catalog_argument(run_parser)
+    run_parser.set_defaults(func=command_run)
+
+    batch_parser = subparsers.add_parser('batch', help="Documente tous les .pbit d'un dossier ou d'un motif glob")
+    batch_parser.add_argument('sources', nargs='+', help="Dossiers, fichiers .pbit ou motifs glob (ex. 'rapports/**/*.pbit')")
+    batch_parser.add_argument('-o', '--output-dir', default=None, help="Dossier de sortie (défaut : à côté de chaque .pbit)")
+    batch_parser.add_argument('-j', '--workers', type=int, default=None, help="Nombre de processus (défaut : nombre de cœurs)")
+    add_debug_json_argument(batch_parser)
+    add_stream_argument(batch_parser)
+    add_format_argument(batch_parser)
+    batch_parser.add_argument('--cache', action='store_true', help="Réutilise les résultats des exécutions précédentes")
+    add_cache_arguments(batch_parser)
+    add_metrics_arguments(batch_parser)
+    add_catalog_argument(batch_parser)
+    batch_parser.set_defaults(func=command_batch)
+
+    watch_parser = subparsers.add_parser(
+        'watch', help="Surveille des .pbit et régénère la documentation de chaque rapport modifié"
+    )
+    watch_parser.add_argument('sources', nargs='*', help="Dossiers, fichiers .pbit ou motifs glob (défaut : dossier du script)")
+    watch_parser.add_argument('-o', '--output-dir', default=None, help="Dossier de sortie (défaut : à côté de chaque .pbit)")
+    watch_parser.add_argument(
+        '--interval',
+        type=float,
+        default=DEFAULT_INTERVAL,
+        help=f"Intervalle de scrutation en secondes (défaut : {DEFAULT_INTERVAL:g})"
+    )
+    add_stream_argument(watch_parser)
+    add_format_argument(watch_parser)
+    watch_parser.set_defaults(func=command_watch)
+
+    serve_parser = subparsers.add_parser('serve', help="Service HTTP local : téléversement d'un .pbit, documentation en retour")
+    serve_parser.add_argument('--host', default=server.DEFAULT_HOST, help=f"Adresse d'écoute (défaut : {server.DEFAULT_HOST})")
+    serve_parser.add_argument('--port', type=int, default=server.DEFAULT_PORT, help=f"Port (défaut : {server.DEFAULT_PORT})")
+    serve_parser.add_argument('-j', '--workers', type=int, default=None, help="Nombre de processus de rendu (défaut : nombre de cœurs)")
+    serve_parser.add_argument(
+        '--max-queue',
+        type=int,
+        default=server.DEFAULT_MAX_QUEUE,
+        help="Rendus en cours au-delà desquels les demandes sont refusées (503)"
+    )
+    serve_parser.add_argument('--max-upload', type=int, default=server.DEFAULT_MAX_UPLOAD_MB, help="Taille maximale d'un .pbit en Mo")
+    serve_parser.add_argument(
+        '--max-documents',
+        type=int,
+        default=server.DEFAULT_MAX_DOCUMENTS,
+        help="Documents rendus gardés pour être resservis ; au-delà, les plus anciens sont supprimés"
+    )
+    serve_parser.add_argument('--work-dir', default=None, help="Dossier des fichiers reçus et produits (défaut : dossier temporaire)")
+    serve_parser.add_argument('--cache', action='store_true', help="Réutilise les résultats des exécutions précédentes")
+    add_cache_arguments(serve_parser)
+    serve_parser.set_defaults(func=command_serve)
+
+    cache_parser = subparsers.add_parser('cache', help="Inspecte ou vide le cache des résultats")
+    cache_parser.add_argument('action', choices=('info', 'clear'), nargs='?', default='info')
+    add_cache_arguments(cache_parser)
+    cache_parser.set_defaults(func=command_cache)
+
+    diff_parser = subparsers.add_parser('diff', help="Compare deux versions d'un modèle (.pbit ou extraction JSON en cache)")
+    diff_parser.add_argument('old', help="Ancienne version (.pbit ou .json)")
+    diff_parser.add_argument('new', help="Nouvelle version (.pbit ou .json)")
+    diff_parser.add_argument(
+        '-o', '--output',
+        default=None,
+        help="Préfixe des fichiers de sortie .docx et .json (défaut : 'differences' à côté de la nouvelle version)"
+    )
+    diff_parser.set_defaults(func=command_diff)
+
+    lineage_parser = subparsers.add_parser('lineage', help="Affiche les dépendances amont et aval d'un objet du modèle")
+    lineage_parser.add_argument('source', help="Modèle à analyser (.pbit ou extraction .json)")
+    lineage_parser.add_argument('object', help="Objet : [Mesure], Table[Colonne] ou 'Table'")
+    lineage_parser.set_defaults(func=command_lineage)
+
+    unused_parser = subparsers.add_parser('unused', help="Liste les mesures et colonnes inutilisées de un ou plusieurs .pbit")
+    unused_parser.add_argument('sources', nargs='+', help="Dossiers, fichiers .pbit ou motifs glob")
+    unused_parser.add_argument('-j', '--workers', type=int, default=None, help="Nombre de processus (défaut : nombre de cœurs)")
+    unused_parser.add_argument('-o', '--output', default=None, help="Fichier JSON où enregistrer les résultats")
+    unused_parser.set_defaults(func=command_unused)
+
+    search_parser = subparsers.add_parser('search', help="Recherche une colonne, une mesure ou un texte dans les expressions du catalogue")
+    search_parser.add_argument('catalog', help="Catalogue SQLite (voir --catalog de run et batch)")
+    search_parser.add_argument('text', help="Texte recherché, ex. 'Ventes[Montant]' (3 caractères au moins pour l'index)")
+    search_parser.add_argument(
+        '--kind',
+        choices=('measure', 'calculated_column', 'calculated_table', 'partition'),
+        default=None,
+        help="Limite la recherche à un type d'objet"
+    )
+    search_parser.add_argument('--limit', type=int, default=50, help="Nombre maximal de résultats (défaut : 50)")
+    search_parser.add_argument('-o', '--output', default=None, help="Fichier JSON où enregistrer les résultats")
+    search_parser.set_defaults(func=command_search)
+
+    argv = sys.argv[1:]
+    if not argv or argv[0] not in COMMANDS + ('-h', '--help'):
+        argv = ['run'] + argv
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
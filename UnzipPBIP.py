@@ -7,78 +7,93 @@ import argparse
 DEFAULT_ROOT = Path(__file__).resolve().parent
 
 
-def extract_pbit_file(root_dir: Path):
-    """
-    Extrait le premier fichier .pbit trouvé dans root_dir, supprime les CustomVisuals,
-    extrait le contenu, puis déplace et renomme DataModelSchema en .txt.
-    Nettoie le .zip temporaire et le dossier d'extraction.
-    """
-    # Chercher automatiquement le premier fichier .pbit
+# Membres de l'archive utiles à la documentation
+SCHEMA_MEMBER = 'DataModelSchema'
+LAYOUT_MEMBER = 'Report/Layout'
+
+
+def find_pbit(root_dir: Path):
+    """Retourne le premier fichier .pbit trouvé dans root_dir, ou None."""
     pbit_files = list(root_dir.glob('*.pbit'))
     if not pbit_files:
         print(f"Aucun fichier .pbit trouvé dans {root_dir}")
-        return
+        return None
+    return pbit_files[0]
+
+
+class PbitArchive:
+    """
+    Session de lecture d'un .pbit : l'archive est ouverte une seule fois en lecture
+    seule et son répertoire central indexé une seule fois par nom de membre.
+    Les étapes modèle et layout y lisent paresseusement les membres dont elles ont besoin.
+
+        with PbitArchive(pbit_path) as archive:
+            schema = archive.read(SCHEMA_MEMBER)
+            layout = archive.read(LAYOUT_MEMBER)
+    """
+
+    def __init__(self, pbit_path: Path):
+        self.path = Path(pbit_path)
+        self._zip = zipfile.ZipFile(self.path, 'r')
+        # Index {nom normalisé: ZipInfo}, le premier membre d'un nom donné l'emporte
+        self._index = {}
+        for member in self._zip.infolist():
+            self._index.setdefault(member.filename.replace('\\', '/'), member)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
 
-    original_pbit = pbit_files[0]
+    def close(self):
+        self._zip.close()
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def names(self):
+        """Noms normalisés de tous les membres de l'archive."""
+        return list(self._index)
+
+    def info(self, name):
+        """ZipInfo du membre, ou None s'il est absent."""
+        return self._index.get(name)
+
+    def open(self, name):
+        """Ouvre le membre en flux (pour un parseur incrémental ou une copie) ; None s'il est absent."""
+        member = self._index.get(name)
+        return self._zip.open(member) if member is not None else None
+
+    def read(self, name):
+        """Lit le membre entier en mémoire ; None s'il est absent."""
+        member = self._index.get(name)
+        return self._zip.read(member) if member is not None else None
+
+
+def extract_pbit_file(root_dir: Path):
+    """
+    Lit DataModelSchema directement dans le premier fichier .pbit trouvé dans root_dir
+    et l'écrit en flux vers DataModelSchema.txt, sans extraire le reste de l'archive.
+    Retourne le chemin du fichier .txt produit, ou None.
+    """
+    original_pbit = find_pbit(root_dir)
+    if original_pbit is None:
+        return None
     print(f"Fichier source détecté : {original_pbit.name}")
 
-    # Préparer les chemins
-    copy_pbit = original_pbit.with_name(original_pbit.stem + '_Originale.pbit')
-    zip_file = copy_pbit.with_suffix('.zip')
-    extract_folder = root_dir / original_pbit.stem
-
-    # Copier puis renommer en .zip
-    shutil.copy(original_pbit, copy_pbit)
-    if zip_file.exists():
-        zip_file.unlink()
-    copy_pbit.rename(zip_file)
-
-    # Extraction en sautant les CustomVisuals
-    if extract_folder.exists():
-        shutil.rmtree(extract_folder, onerror=lambda func, path, exc: print(f"Avertissement suppression : {path} — {exc}"))
-    extract_folder.mkdir(parents=True, exist_ok=True)
-
-    with zipfile.ZipFile(zip_file, 'r') as zip_ref:
-        for member in zip_ref.infolist():
-            fn = member.filename.replace('\\', '/')
-            if fn.startswith("Report/CustomVisuals/"):
-                continue
-
-            target = extract_folder / fn
-            if member.is_dir():
-                target.mkdir(parents=True, exist_ok=True)
-            else:
-                target.parent.mkdir(parents=True, exist_ok=True)
-                with zip_ref.open(member) as src_file, open(target, 'wb') as dest_file:
-                    shutil.copyfileobj(src_file, dest_file)
-
-    print(f"Extraction terminée dans {extract_folder}")
-
-    # Recherche et déplacement de DataModelSchema*
-    matches = list(extract_folder.rglob('DataModelSchema*'))
-    if not matches:
-        print("Fichier 'DataModelSchema' introuvable dans l'extraction.")
-    else:
-        schema_file = matches[0]
-        print(f"Fichier source DataModelSchema détecté : {schema_file.name}")
-
-        dest_txt = root_dir / (schema_file.name + '.txt')
-        if dest_txt.exists():
-            dest_txt.unlink()
-        shutil.move(str(schema_file), str(dest_txt))
-        print(f"{schema_file.name} déplacé et renommé en {dest_txt.name}")
-
-    # Nettoyage : suppression du zip et du dossier d'extraction
-    try:
-        if zip_file.exists():
-            zip_file.unlink()
-        if extract_folder.exists():
-            shutil.rmtree(extract_folder)
-        # Supprimer la copie .pbit
-        if copy_pbit.exists():
-            copy_pbit.unlink()
-    except Exception as e:
-        print(f"Avertissement suppression fichiers temporaires : {e}")
+    with PbitArchive(original_pbit) as archive:
+        src_file = archive.open(SCHEMA_MEMBER)
+        if src_file is None:
+            print("Fichier 'DataModelSchema' introuvable dans l'archive.")
+            return None
+
+        dest_txt = root_dir / (SCHEMA_MEMBER + '.txt')
+        with src_file, open(dest_txt, 'wb') as dest_file:
+            shutil.copyfileobj(src_file, dest_file)
+
+    print(f"{SCHEMA_MEMBER} lu dans l'archive et enregistré sous {dest_txt.name}")
+    return dest_txt
 
 
 def main():
@@ -1,9 +1,14 @@
 from pathlib import Path
-import json
+import re
+from xml.sax.saxutils import escape
 from docx import Document
-from docx.shared import Pt, RGBColor
-from docx.oxml.ns import qn
-from docx.oxml import OxmlElement
+from docx.shared import Emu
+from docx.oxml.ns import nsdecls
+from docx.oxml import parse_xml
+
+from EncodeJSON import loads
+from model import (CalculatedColumn, CalculatedTable, Column, Hierarchy, Measure, Model, Partition, Relationship,
+                   Table)
 
 # Répertoire dans lequel le script est exécuté
 base_dir = Path(__file__).resolve().parent
@@ -15,209 +20,295 @@ EXCLUDE_KEYWORDS = ['LocalDateTable', 'DateTableTemplate']
 
 
 def load_report(path):
-    with open(path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return loads(Path(path).read_bytes())
 
-def extract_metadata(report):
+def _expression(obj):
+    expr = obj.get('expression', '')
+    if isinstance(expr, list):
+        expr = '\n'.join(expr)
+    return expr
+
+def extract_table(tbl):
+    """
+    Extrait une table du modèle : CalculatedTable, Table, ou None si elle est exclue.
+    """
+    name = tbl.get('name', '')
+    # Exclusion
+    if any(key in name for key in EXCLUDE_KEYWORDS):
+        return None
+    # Table calculée
+    if tbl.get('type') == 'calculatedTable':
+        return CalculatedTable(name, _expression(tbl))
+    # Colonnes (toutes, pour l'analyse d'utilisation)
+    columns = [
+        Column(col.get('name'), col.get('type'), col.get('sortByColumn'))
+        for col in tbl.get('columns', [])
+    ]
+    # Mesures
+    measures = [Measure(m.get('name'), _expression(m)) for m in tbl.get('measures', [])]
+    # Colonne calculée
+    calculated_columns = [
+        CalculatedColumn(col.get('name'), _expression(col))
+        for col in tbl.get('columns', [])
+        if col.get('type') in ['calculated', 'calculatedTableColumn']
+    ]
+    # Partitions (incluant type et expression)
+    partitions = []
+    for part in tbl.get('partitions', []):
+        src = part.get('source', {})
+        src_type = src.get('type', '')
+        src_expr = src.get('expression', '') if src_type == 'calculated' else ''
+        partitions.append(Partition(part.get('name'), part.get('mode'), src_type, src_expr))
+    # Hiérarchies
+    hierarchies = [
+        Hierarchy(
+            hier.get('name'),
+            [lvl.get('name') for lvl in hier.get('levels', [])],
+            [lvl.get('column') or lvl.get('name') for lvl in hier.get('levels', [])],
+        )
+        for hier in tbl.get('hierarchies', [])
+    ]
+    return Table(name, measures, calculated_columns, partitions, hierarchies, columns)
+
+def extract_relationship(rel):
+    return Relationship(rel.get('name'), rel.get('fromTable'), rel.get('fromColumn'),
+                        rel.get('toTable'), rel.get('toColumn'))
+
+def extract_model(items):
+    """
+    Construit le Model à partir de paires (membre, élément) de model, consommées
+    au fil de l'eau (voir EncodeJSON.iter_model_items) : 'tables' et 'relationships'.
+    """
     tables = []
     calc_tables = []
-    for tbl in report.get('model', {}).get('tables', []):
-        name = tbl.get('name', '')
-        # Exclusion
-        if any(key in name for key in EXCLUDE_KEYWORDS):
+    relationships = []
+    for member, item in items:
+        if member == 'relationships':
+            relationships.append(extract_relationship(item))
             continue
-        # Table calculée
-        if tbl.get('type') == 'calculatedTable':
-            expr = tbl.get('expression', '')
-            if isinstance(expr, list):
-                expr = '\n'.join(expr)
-            calc_tables.append({'name': name, 'expression': expr})
-            continue
-        # Table standard
-        info = {
-            'name': name,
-            'measures': [],
-            'calculated_columns': [],
-            'partitions': [],
-            'hierarchies': []
-        }
-        # Mesures
-        for m in tbl.get('measures', []):
-            expr = m.get('expression', '')
-            if isinstance(expr, list):
-                expr = '\n'.join(expr)
-            info['measures'].append({'name': m.get('name'), 'expression': expr})
-        # Colonne calculée
-        for col in tbl.get('columns', []):
-            if col.get('type') in ['calculated', 'calculatedTableColumn']:
-                expr = col.get('expression', '')
-                if isinstance(expr, list):
-                    expr = '\n'.join(expr)
-                info['calculated_columns'].append({'name': col.get('name'), 'expression': expr})
-        # Partitions (incluant type et expression)
-        for part in tbl.get('partitions', []):
-            src = part.get('source', {})
-            src_type = src.get('type', '')
-            src_expr = src.get('expression', '') if src_type == 'calculated' else ''
-            info['partitions'].append({
-                'name': part.get('name'),
-                'mode': part.get('mode'),
-                'source_type': src_type,
-                'source_expression': src_expr
-            })
-        # Hiérarchies
-        for hier in tbl.get('hierarchies', []):
-            levels = [lvl.get('name') for lvl in hier.get('levels', [])]
-            info['hierarchies'].append({'name': hier.get('name'), 'levels': levels})
-        tables.append(info)
-    return tables, calc_tables
-
-def style_table(table, headers, rows):
+        extracted = extract_table(item)
+        if isinstance(extracted, CalculatedTable):
+            calc_tables.append(extracted)
+        elif extracted is not None:
+            tables.append(extracted)
+    return Model(tables, calc_tables, relationships)
+
+def extract_metadata(report):
+    model = report.get('model', {})
+    return extract_model(
+        (member, item) for member in ('tables', 'relationships') for item in model.get(member, [])
+    )
+
+# ——— Fragments XML du rendu des tables ———
+# Les tables sont générées en bloc (une chaîne XML parsée une seule fois par lxml)
+# plutôt que cellule par cellule via l'API objet de python-docx.
+_BORDER_SIDES = ('top', 'left', 'bottom', 'right', 'insideH', 'insideV')
+# Bordures fines noires (0.5 pt) portées une seule fois par la table
+_TBL_BORDERS = '<w:tblBorders>' + ''.join(
+    f'<w:{side} w:val="single" w:sz="4" w:space="0" w:color="000000"/>' for side in _BORDER_SIDES
+) + '</w:tblBorders>'
+_TBL_LOOK = ('<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" '
+             'w:noHBand="0" w:noVBand="1" w:val="04A0"/>')
+# En-tête : Calibri 11 pt gras blanc sur fond rouge
+_HEADER_FILL = 'FF0000'
+_HEADER_RPR = ('<w:rPr><w:rFonts w:ascii="Calibri" w:hAnsi="Calibri"/><w:b/>'
+               '<w:color w:val="FFFFFF"/><w:sz w:val="22"/></w:rPr>')
+# Colonnes d'expression : Consolas 9 pt, indentation 6 pt, interligne 1.1
+_CODE_PPR = ('<w:pPr><w:spacing w:before="0" w:after="0" w:line="264" w:lineRule="auto"/>'
+             '<w:ind w:left="120"/></w:pPr>')
+_CODE_RPR = ('<w:rPr><w:rFonts w:ascii="Consolas" w:hAnsi="Consolas"/>'
+             '<w:color w:val="000000"/><w:sz w:val="18"/></w:rPr>')
+# Autres colonnes : Calibri 10 pt, interligne 1.15
+_TEXT_PPR = '<w:pPr><w:spacing w:before="0" w:after="0" w:line="276" w:lineRule="auto"/></w:pPr>'
+_TEXT_RPR = ('<w:rPr><w:rFonts w:ascii="Calibri" w:hAnsi="Calibri"/>'
+             '<w:color w:val="000000"/><w:sz w:val="20"/></w:rPr>')
+# Alternance de lignes blanc/gris clair
+_ROW_FILLS = ('FFFFFF', 'F2F2F2')
+
+# Caractères interdits en XML 1.0 (python-docx refuserait ces chaînes)
+_INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_RUN_SPECIALS = re.compile('([\t\r\n])')
+
+
+def run_xml(text, rpr):
+    """Run Word : tabulations → <w:tab/>, retours à la ligne → <w:br/> (comme run.text de python-docx)."""
+    parts = []
+    for piece in _RUN_SPECIALS.split(_INVALID_XML_CHARS.sub('', text)):
+        if piece == '\t':
+            parts.append('<w:tab/>')
+        elif piece in ('\r', '\n'):
+            parts.append('<w:br/>')
+        elif piece:
+            parts.append(f'<w:t xml:space="preserve">{escape(piece)}</w:t>')
+    return f'<w:r>{rpr}{"".join(parts)}</w:r>'
+
+def _cell_xml(width, fill, paragraphs):
+    return (f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width}"/><w:shd w:fill="{fill}"/></w:tcPr>'
+            f'{paragraphs}</w:tc>')
+
+def table_xml(headers, rows, col_width, code_columns=(1,)):
     """
-    Applique un style soigné à une table Word :
+    Génère le XML complet d'une table stylée :
     - En-têtes en Calibri 11 pt blanc sur fond rouge, bordures fines noires.
     - Alternance de lignes blanc/gris clair.
-    - Colonne d'expressions en Consolas 9 pt monospace, indentation, interligne resserré.
+    - Colonnes d'expressions (code_columns, la 2e par défaut) en Consolas 9 pt
+      monospace, indentation, interligne resserré ; une ligne de texte par paragraphe.
+    col_width est la largeur d'une colonne en twips.
     """
-    # ——— 1. Style de l’en-tête ———
-    hdr_cells = table.rows[0].cells
-    for col_idx, header_text in enumerate(headers):
-        cell = hdr_cells[col_idx]
-        cell.text = ''
-        p = cell.paragraphs[0]
-        run = p.add_run(header_text)
-        # Police et couleur du texte de l'en-tête
-        run.font.name = 'Calibri'
-        run.font.size = Pt(11)
-        run.font.bold = True
-        run.font.color.rgb = RGBColor(255, 255, 255)
-        # Fond rouge
-        tcPr = cell._element.get_or_add_tcPr()
-        shd = OxmlElement('w:shd')
-        shd.set(qn('w:fill'), 'FF0000')
-        tcPr.append(shd)
-        # Bordures fines noires
-        borders = OxmlElement('w:tcBorders')
-        for side in ('top', 'left', 'bottom', 'right', 'insideH', 'insideV'):
-            bd = OxmlElement(f'w:{side}')
-            bd.set(qn('w:val'), 'single')
-            bd.set(qn('w:sz'), '4')       # épaisseur 0.5 pt
-            bd.set(qn('w:space'), '0')
-            bd.set(qn('w:color'), '000000')
-            borders.append(bd)
-        tcPr.append(borders)
-
-    # ——— 2. Style des lignes de données ———
-    for row_idx, row_values in enumerate(rows):
-        cells = table.add_row().cells
-        # Couleur de fond alternée
-        bg_color = 'FFFFFF' if (row_idx % 2 == 0) else 'F2F2F2'
+    out = [
+        f'<w:tbl {nsdecls("w")}><w:tblPr><w:tblW w:type="auto" w:w="0"/>{_TBL_BORDERS}{_TBL_LOOK}</w:tblPr>',
+        '<w:tblGrid>', f'<w:gridCol w:w="{col_width}"/>' * len(headers), '</w:tblGrid>',
+        '<w:tr>',
+    ]
+    for header_text in headers:
+        out.append(_cell_xml(col_width, _HEADER_FILL, f'<w:p>{run_xml(str(header_text), _HEADER_RPR)}</w:p>'))
+    out.append('</w:tr>')
 
+    for row_idx, row_values in enumerate(rows):
+        fill = _ROW_FILLS[row_idx % 2]
+        out.append('<w:tr>')
         for col_idx, cell_value in enumerate(row_values):
-            cell = cells[col_idx]
-            cell.text = ''
-            lines = str(cell_value).split('\n')
-            for line_idx, text_line in enumerate(lines):
-                if line_idx == 0:
-                    p = cell.paragraphs[0]
-                else:
-                    p = cell.add_paragraph()
-                run = p.add_run(text_line)
-
-                # ——— 2.a Colonne d'expression (indice 1) : Consolas 9 pt, indentation ———
-                if col_idx == 1:
-                    run.font.name = 'Consolas'
-                    run._element.rPr.rFonts.set(qn('w:ascii'), 'Consolas')
-                    run._element.rPr.rFonts.set(qn('w:hAnsi'), 'Consolas')
-                    run.font.size = Pt(9)
-                    run.font.color.rgb = RGBColor(0, 0, 0)
-                    p.paragraph_format.left_indent = Pt(6)
-                    p.paragraph_format.space_after = Pt(0)
-                    p.paragraph_format.space_before = Pt(0)
-                    p.paragraph_format.line_spacing = 1.1
-                else:
-                    # Colonne non-expression : Calibri 10 pt, texte noir
-                    run.font.name = 'Calibri'
-                    run.font.size = Pt(10)
-                    run.font.color.rgb = RGBColor(0, 0, 0)
-                    p.paragraph_format.space_after = Pt(0)
-                    p.paragraph_format.space_before = Pt(0)
-                    p.paragraph_format.line_spacing = 1.15
-
-            # ——— 2.b Fond et bordures pour chaque cellule ———
-            tcPr = cell._element.get_or_add_tcPr()
-            shd = OxmlElement('w:shd')
-            shd.set(qn('w:fill'), bg_color)
-            tcPr.append(shd)
-
-            borders = OxmlElement('w:tcBorders')
-            for side in ('top', 'left', 'bottom', 'right', 'insideH', 'insideV'):
-                bd = OxmlElement(f'w:{side}')
-                bd.set(qn('w:val'), 'single')
-                bd.set(qn('w:sz'), '4')
-                bd.set(qn('w:space'), '0')
-                bd.set(qn('w:color'), '000000')
-                borders.append(bd)
-            tcPr.append(borders)
-
-def generate_word(tables, calc_tables, output_path):
-    doc = Document()
-    doc.add_heading('Documentation automatique du modèle Power BI', level=0)
+            ppr, rpr = (_CODE_PPR, _CODE_RPR) if col_idx in code_columns else (_TEXT_PPR, _TEXT_RPR)
+            paragraphs = ''.join(
+                f'<w:p>{ppr}{run_xml(line, rpr)}</w:p>' for line in str(cell_value).split('\n')
+            )
+            out.append(_cell_xml(col_width, fill, paragraphs))
+        out.append('</w:tr>')
+    out.append('</w:tbl>')
+    return ''.join(out)
+
+def add_styled_table(doc, headers, rows, code_columns=(1,)):
+    """Ajoute en fin de document une table stylée, générée en bloc (voir table_xml)."""
+    col_width = Emu(doc._block_width // len(headers)).twips
+    tbl = parse_xml(table_xml(headers, rows, col_width, code_columns))
+    doc.element.body._insert_tbl(tbl)
+    return tbl
+
+# ——— Structure du document ———
+# Le document est décrit comme une suite de blocs, consommée soit par python-docx
+# (write_blocks), soit par l'écriture en flux (docx_stream) :
+#   ('heading', texte, niveau)
+#   ('paragraph', texte, style)        style None : paragraphe normal
+#   ('table', en-têtes, lignes, colonnes de code)
+#   ('page_break',)
+#   ('xml', fragment)                  XML WordprocessingML déjà construit (docx_stream seulement)
+
+def iter_table_blocks(tbl):
+    """Blocs de la section d'une table usuelle."""
+    yield ('heading', f"Table: {tbl.name}", 1)
+
+    # Mesures
+    if tbl.measures:
+        yield ('paragraph', 'Mesures :', 'Intense Quote')
+        rows = [(m.name, m.expression) for m in tbl.measures]
+        yield ('table', ['Nom', 'Expression'], rows, (1,))
+        yield ('paragraph', '', None)
+
+    # Colonnes calculées
+    if tbl.calculated_columns:
+        yield ('paragraph', 'Colonnes calculées :', 'Intense Quote')
+        rows = [(c.name, c.expression) for c in tbl.calculated_columns]
+        yield ('table', ['Nom', 'Expression'], rows, (1,))
+        yield ('paragraph', '', None)
+
+    # Partitions
+    if tbl.partitions:
+        yield ('paragraph', 'Partitions :', 'Intense Quote')
+        rows = [(p.name, p.mode, p.source_type, p.source_expression) for p in tbl.partitions]
+        yield ('table', ['Nom', 'Mode', 'Type source', 'Expression source'], rows, (1,))
+        yield ('paragraph', '', None)
+
+    # Hiérarchies
+    if tbl.hierarchies:
+        yield ('paragraph', 'Hiérarchies :', 'Intense Quote')
+        for hier in tbl.hierarchies:
+            yield ('paragraph', f"{hier.name}: {', '.join(hier.levels)}", None)
+        yield ('paragraph', '', None)
+
+def iter_model_blocks(model, sections=None):
+    """
+    Blocs de la documentation du Model, table par table. sections remplace
+    éventuellement les blocs des tables usuelles : une suite de listes de blocs,
+    une par table et dans l'ordre de model.tables (voir docx_stream.iter_parallel_sections).
+    """
+    yield ('heading', 'Documentation automatique du modèle Power BI', 0)
 
     # --- Tables calculées ---
-    if calc_tables:
-        doc.add_heading('Tables calculées', level=1)
-        t = doc.add_table(rows=1, cols=2)
-        headers = ['Nom', 'Expression']
-        rows = [(c['name'], c['expression']) for c in calc_tables]
-        style_table(t, headers, rows)
-        doc.add_paragraph()
+    if model.calc_tables:
+        yield ('heading', 'Tables calculées', 1)
+        rows = [(c.name, c.expression) for c in model.calc_tables]
+        yield ('table', ['Nom', 'Expression'], rows, (1,))
+        yield ('paragraph', '', None)
 
     # --- Tables usuelles ---
-    for tbl in tables:
-        doc.add_heading(f"Table: {tbl['name']}", level=1)
-
-        # Mesures
-        if tbl['measures']:
-            doc.add_paragraph('Mesures :', style='Intense Quote')
-            t = doc.add_table(rows=1, cols=2)
-            headers = ['Nom', 'Expression']
-            rows = [(m['name'], m['expression']) for m in tbl['measures']]
-            style_table(t, headers, rows)
-            doc.add_paragraph()
-
-        # Colonnes calculées
-        if tbl['calculated_columns']:
-            doc.add_paragraph('Colonnes calculées :', style='Intense Quote')
-            t = doc.add_table(rows=1, cols=2)
-            headers = ['Nom', 'Expression']
-            rows = [(c['name'], c['expression']) for c in tbl['calculated_columns']]
-            style_table(t, headers, rows)
-            doc.add_paragraph()
-
-        # Partitions
-        if tbl['partitions']:
-            doc.add_paragraph('Partitions :', style='Intense Quote')
-            t = doc.add_table(rows=1, cols=4)
-            headers = ['Nom', 'Mode', 'Type source', 'Expression source']
-            rows = [
-                (p['name'], p['mode'], p['source_type'], p['source_expression'])
-                for p in tbl['partitions']
-            ]
-            style_table(t, headers, rows)
-            doc.add_paragraph()
-
-        # Hiérarchies
-        if tbl['hierarchies']:
-            doc.add_paragraph('Hiérarchies :', style='Intense Quote')
-            for hier in tbl['hierarchies']:
-                doc.add_paragraph(f"{hier['name']}: {', '.join(hier['levels'])}")
-            doc.add_paragraph()
-
-    doc.save(output_path)
+    for blocks in map(iter_table_blocks, model.tables) if sections is None else sections:
+        yield from blocks
+
+def iter_pages_blocks(pages):
+    """Blocs de la section « Visibilité des pages »."""
+    yield ('page_break',)
+    yield ('heading', "Visibilité des pages", 1)
+    headers = ["Nom de la page", "ID de la page", "Visibilité"]
+    yield ('table', headers, [[p[h] for h in headers] for p in pages], ())
+
+def write_blocks(doc, blocks):
+    """Ajoute des blocs à un document python-docx."""
+    for block in blocks:
+        kind = block[0]
+        if kind == 'heading':
+            doc.add_heading(block[1], level=block[2])
+        elif kind == 'paragraph':
+            doc.add_paragraph(block[1], style=block[2]) if block[1] else doc.add_paragraph()
+        elif kind == 'table':
+            add_styled_table(doc, block[1], block[2], code_columns=block[3])
+        elif kind == 'page_break':
+            doc.add_page_break()
+        else:
+            # Les fragments ('xml', …) ne sont écrits que par docx_stream.StreamingDocxWriter
+            raise ValueError(f"Bloc non pris en charge par python-docx : {kind!r}")
+
+
+class DocumentBuilder:
+    """
+    Assemble le document Word en mémoire : chaque étape y ajoute ses sections
+    (modèle, lignage, pages…) et le fichier n'est écrit qu'une seule fois, à la
+    fermeture. Même interface que docx_stream.StreamingDocxWriter.
+
+        with DocumentBuilder(path) as builder:
+            builder.write_blocks(iter_model_blocks(model))
+            builder.write_blocks(iter_pages_blocks(pages))
+    """
+
+    def __init__(self, output_path: Path):
+        self.output_path = Path(output_path)
+        self.doc = Document()
+        self._saved = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # En cas d'erreur, aucun document partiel n'est écrit
+        if exc_type is None:
+            self.close()
+
+    def write_blocks(self, blocks):
+        if self._saved:
+            raise RuntimeError(f"Document déjà écrit : {self.output_path}")
+        write_blocks(self.doc, blocks)
+
+    def close(self):
+        if not self._saved:
+            self.doc.save(self.output_path)
+            self._saved = True
+
+
+def generate_word(model, output_path, blocks=None):
+    """Écrit le document Word du Model (ou des blocs donnés, par défaut ceux de iter_model_blocks)."""
+    with DocumentBuilder(output_path) as builder:
+        builder.write_blocks(iter_model_blocks(model) if blocks is None else blocks)
     print(f"Documentation Word générée : {output_path}")
 
 if __name__ == '__main__':
     report = load_report(INPUT_FILE)
-    tables, calc_tables = extract_metadata(report)
-    generate_word(tables, calc_tables, OUTPUT_FILE)
+    generate_word(extract_metadata(report), OUTPUT_FILE)
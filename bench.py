@@ -0,0 +1,251 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+import EncodeJSON
+import LayoutFinder
+import UnzipPBIP
+import autodoc
+import renderers
+from cache import TOOL_VERSION
+from docx_stream import generate_word_streaming
+from usage import UsageIndex
+
+# Tailles prédéfinies : tables, mesures par table, longueur des expressions, pages, visuels par page
+PRESETS = {
+    'small': dict(tables=10, measures=10, columns=10, expr_len=80, pages=3, visuals=5),
+    'medium': dict(tables=100, measures=20, columns=15, expr_len=200, pages=10, visuals=10),
+    'large': dict(tables=400, measures=25, columns=20, expr_len=400, pages=30, visuals=15),
+}
+ENCODINGS = ('utf-16-le', 'utf-8')
+
+
+# ——— Génération de .pbit synthétiques ———
+def _expression(t, i, expr_len):
+    """Expression DAX d'une mesure, de longueur ~expr_len, avec des références de colonnes et de mesures."""
+    base = f"CALCULATE(SUM('Table {t}'[Colonne {i % 5}]), FILTER('Table {t}', 'Table {t}'[Colonne 0] > 0))"
+    if i:
+        base += f"\n+ [Mesure {t}.{i - 1}]"
+    expr = base
+    while len(expr) < expr_len:
+        expr += "\n// commentaire de remplissage"
+    return expr[:max(expr_len, len(base))]
+
+def synthetic_schema(tables, measures, columns, expr_len):
+    model_tables = []
+    for t in range(tables):
+        model_tables.append({
+            'name': f"Table {t}",
+            'lineageTag': f"tag-{t}",
+            'columns': [
+                {'name': f"Colonne {c}", 'dataType': 'double', 'sourceColumn': f"col{c}",
+                 'annotations': [{'name': 'SummarizationSetBy', 'value': 'Automatic'}]}
+                for c in range(columns)
+            ] + [{'name': 'Colonne calculée', 'type': 'calculated', 'expression': f"'Table {t}'[Colonne 0] * 2"}],
+            'measures': [{'name': f"Mesure {t}.{i}", 'expression': _expression(t, i, expr_len)} for i in range(measures)],
+            'partitions': [{'name': f"Partition {t}", 'mode': 'import',
+                            'source': {'type': 'm', 'expression': ['let', '    Source = x', 'in', '    Source']}}],
+            'hierarchies': [{'name': 'Hiérarchie', 'levels': [{'name': 'Niveau', 'column': 'Colonne 1'}]}],
+        })
+    relationships = [
+        {'name': f"rel{t}", 'fromTable': f"Table {t}", 'fromColumn': 'Colonne 0',
+         'toTable': f"Table {t - 1}", 'toColumn': 'Colonne 0'}
+        for t in range(1, tables)
+    ]
+    return {'name': 'bench', 'compatibilityLevel': 1550,
+            'model': {'culture': 'fr-FR', 'tables': model_tables, 'relationships': relationships,
+                      'annotations': [{'name': 'PBIDesktopVersion', 'value': 'bench'}]}}
+
+def synthetic_layout(tables, measures, pages, visuals):
+    sections = []
+    for p in range(pages):
+        containers = []
+        for v in range(visuals):
+            t = (p * visuals + v) % max(tables, 1)
+            query = {
+                'From': [{'Name': 't', 'Entity': f"Table {t}", 'Type': 0}],
+                'Select': [
+                    {'Measure': {'Expression': {'SourceRef': {'Source': 't'}}, 'Property': f"Mesure {t}.{v % max(measures, 1)}"}},
+                    {'Column': {'Expression': {'SourceRef': {'Source': 't'}}, 'Property': 'Colonne 2'}},
+                ],
+            }
+            config = {'name': f"visuel{p}_{v}", 'singleVisual': {'visualType': 'tableEx', 'prototypeQuery': query}}
+            filters = [{'expression': {'Column': {'Expression': {'SourceRef': {'Entity': f"Table {t}"}}, 'Property': 'Colonne 3'}}}]
+            containers.append({'x': 10 * v, 'y': 0, 'width': 100, 'height': 100,
+                               'config': json.dumps(config), 'filters': json.dumps(filters)})
+        sections.append({'name': f"ReportSection{p}", 'displayName': f"Page {p}",
+                         'config': json.dumps({'visibility': p % 2}), 'visualContainers': containers})
+    return {'id': 0, 'sections': sections, 'config': json.dumps({'version': '5.0'})}
+
+def generate_pbit(path: Path, tables=10, measures=10, columns=10, expr_len=80, pages=3, visuals=5,
+                  encoding='utf-16-le'):
+    """Écrit un .pbit synthétique (DataModelSchema, Layout, Version) et retourne son chemin."""
+    path = Path(path)
+    schema = json.dumps(synthetic_schema(tables, measures, columns, expr_len), ensure_ascii=False)
+    layout = json.dumps(synthetic_layout(tables, measures, pages, visuals), ensure_ascii=False)
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as z:
+        z.writestr(UnzipPBIP.SCHEMA_MEMBER, schema.encode(encoding))
+        z.writestr(UnzipPBIP.LAYOUT_MEMBER, layout.encode(encoding))
+        z.writestr('Version', '1.28'.encode(encoding))
+    return path
+
+
+# ——— Mesures ———
+def _measure(func, repeat, memory):
+    """
+    Meilleur temps sur repeat exécutions, puis pic mémoire (tracemalloc) sur une
+    exécution à part. Les messages des étapes mesurées ne sont pas affichés.
+    """
+    best = None
+    result = None
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        stats = {'seconds': round(best, 6)}
+        if memory:
+            gc.collect()
+            tracemalloc.start()
+            func()
+            stats['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+    return result, stats
+
+def bench_pbit(pbit_path: Path, work_dir: Path, repeat=3, memory=True):
+    """Chronomètre chaque étape de la chaîne sur un .pbit ; retourne {étape: mesures}."""
+    stages = {}
+
+    def run(name, func):
+        result, stats = _measure(func, repeat, memory)
+        stages[name] = stats
+        print(f"  ⏱️ {name} : {stats['seconds']:.3f} s"
+              + (f", pic {stats['peak_bytes'] / 1024 / 1024:.1f} Mo" if 'peak_bytes' in stats else ''))
+        return result
+
+    def read_members():
+        with UnzipPBIP.PbitArchive(pbit_path) as archive:
+            return archive.read(UnzipPBIP.SCHEMA_MEMBER), archive.read(UnzipPBIP.LAYOUT_MEMBER)
+
+    schema_raw, layout_raw = run('lecture', read_members)
+    run('encodage', lambda: EncodeJSON.detect_encoding(schema_raw))
+    report = run('décodage', lambda: EncodeJSON.decode_json(schema_raw))
+    run('extract_metadata', lambda: autodoc.extract_metadata(report))
+    del report
+    model = run('extraction_flux', lambda: autodoc.extract_model(EncodeJSON.iter_model_items(schema_raw)))
+    layout = run('layout', lambda: LayoutFinder.decode_layout(layout_raw))
+    pages = run('pages', lambda: LayoutFinder.extract_pages(LayoutFinder.LayoutModel(layout)))
+    field_usages = run('champs_utilisés', lambda: LayoutFinder.extract_field_usages(LayoutFinder.LayoutModel(layout)))
+    usage = run('index_utilisation', lambda: UsageIndex(model, field_usages))
+    output = work_dir / 'bench.docx'
+    run('generate_word', lambda: renderers.render('docx', model, pages, output, usage=usage))
+    # Sections des tables construites dans un pool de processus (au moins 2, pour mesurer le coût du pool)
+    workers = max(2, os.cpu_count() or 1)
+    run('generate_word_parallèle', lambda: renderers.render('docx', model, pages, output, usage=usage, workers=workers))
+    run('docx_flux', lambda: generate_word_streaming(renderers.iter_blocks(model, pages, usage), output))
+    run('markdown', lambda: renderers.render('md', model, pages, output.with_suffix('.md'), usage=usage))
+    return stages
+
+
+# ——— Résultats ———
+def _git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).resolve().parent,
+                             capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_bench(cases, repeat=3, memory=True):
+    """Génère et chronomètre chaque cas ; retourne le document de résultats (sérialisable en JSON)."""
+    results = {
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'tool_version': TOOL_VERSION,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'json_backend': EncodeJSON.JSON_BACKEND,
+        'repeat': repeat,
+        'cases': [],
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        for params in cases:
+            name = params.pop('name')
+            pbit_path = generate_pbit(work_dir / f"{name}.pbit", **params)
+            print(f"\n📐 {name} : {params} ({pbit_path.stat().st_size / 1024:.0f} Ko)")
+            stages = bench_pbit(pbit_path, work_dir, repeat=repeat, memory=memory)
+            results['cases'].append({'name': name, 'params': params,
+                                     'pbit_bytes': pbit_path.stat().st_size, 'stages': stages})
+    return results
+
+def compare(results, baseline):
+    """Affiche, étape par étape, le rapport de temps entre results et une exécution de référence."""
+    previous = {case['name']: case['stages'] for case in baseline.get('cases', [])}
+    print(f"\n📊 Comparaison avec {baseline.get('commit') or baseline.get('date')} :")
+    for case in results['cases']:
+        before = previous.get(case['name'])
+        if before is None:
+            continue
+        print(f"  {case['name']} :")
+        for stage, stats in case['stages'].items():
+            if stage in before and before[stage]['seconds']:
+                ratio = stats['seconds'] / before[stage]['seconds']
+                # Écart signalé au-delà de 10 %, en ignorant les étapes de quelques millisecondes
+                slower = stats['seconds'] - before[stage]['seconds'] > 0.005
+                flag = ' ⚠️' if ratio > 1.1 and slower else ''
+                print(f"    {stage} : {before[stage]['seconds']:.3f} s → {stats['seconds']:.3f} s (x{ratio:.2f}){flag}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesure les performances de la chaîne sur des .pbit synthétiques")
+    parser.add_argument('--preset', action='append', choices=PRESETS,
+                        help="Taille prédéfinie (répétable) ; défaut : small et medium")
+    parser.add_argument('--tables', type=int, help="Cas personnalisé : nombre de tables")
+    parser.add_argument('--measures', type=int, default=10, help="Mesures par table (cas personnalisé)")
+    parser.add_argument('--columns', type=int, default=10, help="Colonnes par table (cas personnalisé)")
+    parser.add_argument('--expr-len', type=int, default=80, help="Longueur des expressions (cas personnalisé)")
+    parser.add_argument('--pages', type=int, default=3, help="Nombre de pages (cas personnalisé)")
+    parser.add_argument('--visuals', type=int, default=5, help="Visuels par page (cas personnalisé)")
+    parser.add_argument('--encoding', choices=ENCODINGS + ('both',), default='utf-16-le',
+                        help="Encodage des membres du .pbit (défaut : utf-16-le, comme Power BI Desktop)")
+    parser.add_argument('--repeat', type=int, default=3, help="Exécutions par étape (le meilleur temps est retenu)")
+    parser.add_argument('--no-memory', action='store_true', help="Ne mesure pas le pic mémoire (plus rapide)")
+    parser.add_argument('-o', '--output', default=None, help="Fichier JSON des résultats (défaut : bench_<date>.json)")
+    parser.add_argument('--compare', default=None, help="Résultats JSON d'une exécution précédente à comparer")
+    args = parser.parse_args()
+
+    if args.tables is not None:
+        base_cases = [('custom', dict(tables=args.tables, measures=args.measures, columns=args.columns,
+                                      expr_len=args.expr_len, pages=args.pages, visuals=args.visuals))]
+    else:
+        base_cases = [(name, PRESETS[name]) for name in (args.preset or ['small', 'medium'])]
+    encodings = ENCODINGS if args.encoding == 'both' else (args.encoding,)
+    cases = [
+        dict(name=f"{name}-{encoding}", encoding=encoding, **params)
+        for name, params in base_cases for encoding in encodings
+    ]
+
+    results = run_bench(cases, repeat=args.repeat, memory=not args.no_memory)
+    output = Path(args.output or f"bench_{datetime.now():%Y%m%d_%H%M%S}.json")
+    output.write_text(json.dumps(results, ensure_ascii=False, indent=4), encoding='utf-8')
+    print(f"\n💾 Résultats enregistrés : {output}")
+    if args.compare:
+        compare(results, json.loads(Path(args.compare).read_text(encoding='utf-8')))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
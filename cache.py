@@ -0,0 +1,192 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+
+from EncodeJSON import dumps, loads
+from model import Model
+
+# Version de l'outil : à incrémenter dès que l'extraction ou le rendu change,
+# pour invalider les entrées produites par une version précédente
+TOOL_VERSION = '1.3.1'
+
+# Emplacement et taille par défaut du cache
+DEFAULT_CACHE_DIR = Path(os.environ.get('AUTODOC_CACHE_DIR', Path.home() / '.cache' / 'autodoc_pbi'))
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+# Sous-dossiers : documents complets, modèles extraits, pages du layout, fichiers des projets PBIP
+KINDS = ('reports', 'models', 'layouts', 'projects')
+
+
+def digest(raw):
+    """Empreinte SHA-256 d'un membre de l'archive."""
+    return hashlib.sha256(raw).hexdigest()
+
+
+class ResultCache:
+    """
+    Cache local adressé par contenu. Les clés combinent l'empreinte des membres
+    DataModelSchema et Layout avec TOOL_VERSION :
+    - reports/<clé>.docx : document final (les deux membres inchangés) ;
+    - models/<clé>.json  : Model.to_dict() du modèle extrait (DataModelSchema inchangé) ;
+    - layouts/<clé>.json : pages du rapport (Layout inchangé) ;
+    - projects/<clé>.json : fichiers analysés d'un projet PBIP, avec leur date de
+      modification et leur taille (voir pbip.PbipProject).
+    Au-delà de max_bytes, les entrées les moins récemment utilisées sont supprimées.
+    """
+
+    def __init__(self, root: Path = None, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = Path(root) if root else DEFAULT_CACHE_DIR
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(*parts):
+        """Clé d'entrée : empreinte de la version de l'outil et des empreintes de membres."""
+        return hashlib.sha256('\0'.join((TOOL_VERSION,) + parts).encode('utf-8')).hexdigest()
+
+    def _path(self, kind, key, suffix):
+        return self.root / kind / f"{key}{suffix}"
+
+    def _hit(self, path):
+        """Retourne path s'il existe, en rafraîchissant sa date d'utilisation (LRU)."""
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def _store(self, path, write):
+        """Écrit une entrée de façon atomique (fichier temporaire puis renommage), puis fait le ménage."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        self.evict()
+
+    # --- Documents complets ---
+    def get_document(self, key):
+        return self._hit(self._path('reports', key, '.docx'))
+
+    def put_document(self, key, document_path: Path):
+        def write(f):
+            with open(document_path, 'rb') as src:
+                shutil.copyfileobj(src, f)
+        self._store(self._path('reports', key, '.docx'), write)
+
+    # --- Résultats intermédiaires (JSON compact) ---
+    def get_json(self, kind, key):
+        path = self._hit(self._path(kind, key, '.json'))
+        if path is None:
+            return None
+        return loads(path.read_bytes())
+
+    def put_json(self, kind, key, data):
+        payload = dumps(data).encode('utf-8')
+        self._store(self._path(kind, key, '.json'), lambda f: f.write(payload))
+
+    def get_model(self, key):
+        cached = self.get_json('models', key)
+        return Model.from_dict(cached) if cached is not None else None
+
+    def put_model(self, key, model):
+        self.put_json('models', key, model.to_dict())
+
+    # --- Inspection et maintenance ---
+    def entries(self):
+        """Liste (chemin, taille, date d'utilisation) de toutes les entrées."""
+        result = []
+        for kind in KINDS:
+            folder = self.root / kind
+            if not folder.is_dir():
+                continue
+            for path in folder.iterdir():
+                if path.suffix == '.tmp':
+                    continue
+                try:
+                    st = path.stat()
+                except FileNotFoundError:
+                    continue
+                result.append((path, st.st_size, st.st_mtime))
+        return result
+
+    def info(self):
+        """Résumé du cache : emplacement, nombre d'entrées et taille par type."""
+        summary = {'path': str(self.root), 'max_bytes': self.max_bytes, 'total_bytes': 0}
+        for kind in KINDS:
+            summary[kind] = {'count': 0, 'bytes': 0}
+        for path, size, _ in self.entries():
+            summary[path.parent.name]['count'] += 1
+            summary[path.parent.name]['bytes'] += size
+            summary['total_bytes'] += size
+        return summary
+
+    def evict(self):
+        """Supprime les entrées les moins récemment utilisées jusqu'à repasser sous max_bytes."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return 0
+        removed = 0
+        for path, size, _ in sorted(entries, key=lambda e: e[2]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self):
+        """Vide entièrement le cache ; retourne le nombre d'entrées supprimées."""
+        count = len(self.entries())
+        for kind in KINDS:
+            shutil.rmtree(self.root / kind, ignore_errors=True)
+        return count
+
+
+class MemoryCache:
+    """
+    Cache en mémoire du processus, de même interface que ResultCache pour les
+    résultats intermédiaires : le Model et les pages sont gardés tels quels, sans
+    sérialisation, pour un processus résident (voir watch). Les documents ne sont
+    pas conservés. Au-delà de max_entries par type, les entrées les moins
+    récemment utilisées sont oubliées.
+    """
+
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = {kind: OrderedDict() for kind in KINDS}
+
+    key = staticmethod(ResultCache.key)
+
+    def get_json(self, kind, key):
+        entries = self._entries[kind]
+        if key not in entries:
+            return None
+        entries.move_to_end(key)
+        return entries[key]
+
+    def put_json(self, kind, key, data):
+        entries = self._entries[kind]
+        entries[key] = data
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def get_model(self, key):
+        return self.get_json('models', key)
+
+    def put_model(self, key, model):
+        self.put_json('models', key, model)
+
+    def get_document(self, key):
+        return None
+
+    def put_document(self, key, document_path: Path):
+        pass
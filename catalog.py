@@ -0,0 +1,244 @@
+import sqlite3
+import time
+from pathlib import Path
+
+from EncodeJSON import dumps
+from cache import TOOL_VERSION
+
+# Tables du catalogue : une ligne par objet de chaque rapport indexé
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    digest TEXT,
+    tool_version TEXT,
+    indexed_at REAL
+);
+CREATE TABLE IF NOT EXISTS tables (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    expression TEXT
+);
+CREATE TABLE IF NOT EXISTS columns (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    table_name TEXT NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT,
+    sort_by TEXT
+);
+CREATE TABLE IF NOT EXISTS measures (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    table_name TEXT NOT NULL,
+    name TEXT NOT NULL,
+    expression TEXT
+);
+CREATE TABLE IF NOT EXISTS calculated_columns (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    table_name TEXT NOT NULL,
+    name TEXT NOT NULL,
+    expression TEXT
+);
+CREATE TABLE IF NOT EXISTS partitions (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    table_name TEXT NOT NULL,
+    name TEXT,
+    mode TEXT,
+    source_type TEXT,
+    source_expression TEXT
+);
+CREATE TABLE IF NOT EXISTS hierarchies (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    table_name TEXT NOT NULL,
+    name TEXT NOT NULL,
+    levels TEXT,
+    columns TEXT
+);
+CREATE TABLE IF NOT EXISTS relationships (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    name TEXT,
+    from_table TEXT,
+    from_column TEXT,
+    to_table TEXT,
+    to_column TEXT
+);
+CREATE TABLE IF NOT EXISTS pages (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    name TEXT,
+    page_id TEXT,
+    visibility TEXT
+);
+CREATE TABLE IF NOT EXISTS field_usages (
+    report_id INTEGER NOT NULL REFERENCES reports(id) ON DELETE CASCADE,
+    table_name TEXT,
+    field TEXT,
+    kind TEXT,
+    page TEXT,
+    visual TEXT,
+    role TEXT
+);
+CREATE INDEX IF NOT EXISTS columns_name ON columns(table_name, name);
+CREATE INDEX IF NOT EXISTS measures_name ON measures(name);
+CREATE INDEX IF NOT EXISTS field_usages_field ON field_usages(table_name, field);
+"""
+
+# Tables filles : leurs lignes sont supprimées avec le rapport (ON DELETE CASCADE)
+CHILD_TABLES = ('tables', 'columns', 'measures', 'calculated_columns', 'partitions', 'hierarchies',
+                'relationships', 'pages', 'field_usages')
+SCHEMA += ''.join(f"CREATE INDEX IF NOT EXISTS {table}_report ON {table}(report_id);\n" for table in CHILD_TABLES)
+
+# Index plein texte des expressions DAX et M. Le tokenizer trigram (SQLite 3.34+)
+# trouve n'importe quelle sous-chaîne de 3 caractères ou plus, Ventes[Montant] compris.
+FTS_TOKENIZERS = ('trigram', 'unicode61')
+
+
+def _fold(text):
+    return text.lower() if text is not None else None
+
+
+class Catalog:
+    """
+    Catalogue SQLite des métadonnées de tous les rapports documentés : tables,
+    colonnes, mesures, colonnes calculées, partitions, hiérarchies, relations,
+    pages et champs utilisés par les visuels. Chaque rapport est écrit en une seule
+    transaction (executemany par table), et ses expressions sont indexées en
+    plein texte (FTS5) pour retrouver en quelques millisecondes les rapports qui
+    utilisent une colonne ou une mesure.
+
+        with Catalog('catalogue.db') as catalog:
+            catalog.add_report(pbit_path, model, pages, usages, digest)
+            catalog.search('Ventes[Montant]')
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Délai d'attente généreux : les processus d'un traitement par lot écrivent en parallèle
+        self.conn = sqlite3.connect(self.path, timeout=60)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA foreign_keys=ON')
+        # Minuscules Unicode (lower de SQLite ne traite que l'ASCII), comme l'index trigram
+        self.conn.create_function('fold', 1, _fold, deterministic=True)
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+        self.fts = self._create_fts()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _create_fts(self):
+        """
+        Crée l'index plein texte s'il n'existe pas (plusieurs processus peuvent ouvrir
+        le catalogue en même temps) ; retourne False si SQLite n'a pas FTS5 (recherche
+        par sous-chaîne). Toute autre erreur (base verrouillée…) est propagée.
+        """
+        for tokenizer in FTS_TOKENIZERS:
+            try:
+                with self.conn:
+                    self.conn.execute(
+                        "CREATE VIRTUAL TABLE IF NOT EXISTS expressions USING fts5("
+                        f"report_id UNINDEXED, kind UNINDEXED, table_name, name, expression, tokenize='{tokenizer}')"
+                    )
+                return True
+            except sqlite3.OperationalError as e:
+                if 'no such tokenizer' in str(e):
+                    continue
+                if 'no such module: fts5' in str(e):
+                    break
+                raise
+        print("⚠️ FTS5 indisponible dans ce SQLite : recherche sans index plein texte")
+        return False
+
+    def add_report(self, path: Path, model, pages=(), usages=None, digest=None):
+        """
+        Écrit (ou remplace) les métadonnées d'un rapport, en une seule transaction.
+        Un rapport déjà indexé avec la même empreinte et la même version de l'outil
+        n'est pas réécrit. Retourne le nombre de lignes écrites.
+        """
+        path = Path(path).resolve()
+        if digest is not None:
+            row = self.conn.execute('SELECT digest, tool_version FROM reports WHERE path = ?', (str(path),)).fetchone()
+            if row is not None and tuple(row) == (digest, TOOL_VERSION):
+                return 0
+
+        rows = {
+            'tables': [(t.name, 'table', None) for t in model.tables]
+                      + [(c.name, 'calculated', c.expression) for c in model.calc_tables],
+            'columns': [(t.name, c.name, c.type, c.sort_by) for t in model.tables for c in t.columns],
+            'measures': [(t.name, m.name, m.expression) for t, m in model.measures()],
+            'calculated_columns': [(t.name, c.name, c.expression) for t in model.tables for c in t.calculated_columns],
+            'partitions': [(t.name, p.name, p.mode, p.source_type, p.source_expression)
+                           for t in model.tables for p in t.partitions],
+            'hierarchies': [(t.name, h.name, dumps(h.levels), dumps(h.columns))
+                            for t in model.tables for h in t.hierarchies],
+            'relationships': [(r.name, r.from_table, r.from_column, r.to_table, r.to_column)
+                              for r in model.relationships],
+            'pages': [(p["Nom de la page"], p["ID de la page"], p["Visibilité"]) for p in pages],
+            'field_usages': [tuple(u) for u in usages or ()],
+        }
+        expressions = (
+            [('measure', t, n, e) for t, n, e in rows['measures'] if e]
+            + [('calculated_column', t, n, e) for t, n, e in rows['calculated_columns'] if e]
+            + [('calculated_table', '', n, e) for n, _, e in rows['tables'] if e]
+            + [('partition', t, n, e) for t, n, _, _, e in rows['partitions'] if e]
+        )
+
+        with self.conn:
+            report_id = self._replace_report(path, digest)
+            for table, values in rows.items():
+                if values:
+                    placeholders = ', '.join('?' * (len(values[0]) + 1))
+                    self.conn.executemany(f'INSERT INTO {table} VALUES ({placeholders})',
+                                          [(report_id,) + v for v in values])
+            if self.fts:
+                self.conn.executemany('INSERT INTO expressions VALUES (?, ?, ?, ?, ?)',
+                                      [(report_id,) + e for e in expressions])
+        return sum(len(values) for values in rows.values()) + len(expressions)
+
+    def _replace_report(self, path, digest):
+        """Supprime l'ancienne version du rapport (lignes filles comprises) ; retourne le nouvel identifiant."""
+        row = self.conn.execute('SELECT id FROM reports WHERE path = ?', (str(path),)).fetchone()
+        if row is not None:
+            if self.fts:
+                self.conn.execute('DELETE FROM expressions WHERE report_id = ?', (row[0],))
+            self.conn.execute('DELETE FROM reports WHERE id = ?', (row[0],))
+        cursor = self.conn.execute(
+            'INSERT INTO reports (path, name, digest, tool_version, indexed_at) VALUES (?, ?, ?, ?, ?)',
+            (str(path), path.stem, digest, TOOL_VERSION, time.time()),
+        )
+        return cursor.lastrowid
+
+    def search(self, text, kind=None, limit=50):
+        """
+        Expressions qui contiennent text (sans tenir compte de la casse), tous
+        rapports confondus : liste de dicts {'report', 'path', 'kind', 'table',
+        'name', 'expression'}. Deux rapports du même nom se distinguent par path.
+        """
+        if self.fts and len(text) >= 3:
+            query = ('SELECT r.name, r.path, e.kind, e.table_name, e.name, e.expression '
+                     'FROM expressions e JOIN reports r ON r.id = e.report_id WHERE expressions MATCH ?')
+            params = ['"' + text.replace('"', '""') + '"']
+        else:
+            query = ('SELECT r.name, r.path, e.kind, e.table_name, e.name, e.expression FROM ('
+                     "SELECT report_id, 'measure' AS kind, table_name, name, expression FROM measures "
+                     "UNION ALL SELECT report_id, 'calculated_column', table_name, name, expression FROM calculated_columns "
+                     "UNION ALL SELECT report_id, 'calculated_table', '', name, expression FROM tables "
+                     "UNION ALL SELECT report_id, 'partition', table_name, name, source_expression FROM partitions"
+                     ") e JOIN reports r ON r.id = e.report_id WHERE instr(fold(e.expression), fold(?)) > 0")
+            params = [text]
+        if kind:
+            query += ' AND e.kind = ?'
+            params.append(kind)
+        query += ' ORDER BY r.name, r.path, e.table_name, e.name LIMIT ?'
+        params.append(limit)
+        return [
+            {'report': report, 'path': path, 'kind': k, 'table': table, 'name': name, 'expression': expression}
+            for report, path, k, table, name, expression in self.conn.execute(query, params)
+        ]
@@ -0,0 +1,151 @@
+import hashlib
+import json
+from pathlib import Path
+
+from docx import Document
+
+import EncodeJSON
+import UnzipPBIP
+import autodoc
+import pbip
+from model import Model
+
+# Libellés des types d'objets comparés
+KIND_LABELS = {
+    'calculated_table': 'Table calculée',
+    'table': 'Table',
+    'measure': 'Mesure',
+    'calculated_column': 'Colonne calculée',
+    'partition': 'Partition',
+    'hierarchy': 'Hiérarchie',
+}
+
+
+def normalize_expression(expr):
+    """Normalise une expression pour la comparaison : espaces et retours à la ligne ignorés."""
+    return ' '.join(str(expr or '').split())
+
+def fingerprint(*parts):
+    """Empreinte courte d'un objet du modèle (nom + contenu normalisé)."""
+    return hashlib.blake2b('\0'.join(parts).encode('utf-8'), digest_size=16).hexdigest()
+
+def index_objects(model):
+    """
+    Indexe les objets du modèle par (type, table, nom) → (empreinte, texte affiché).
+    Les deux versions sont ensuite comparées par clé, sans comparer les textes entre eux.
+    """
+    index = {}
+    for c in model.calc_tables:
+        expr = c.expression
+        index[('calculated_table', '', c.name)] = (fingerprint(c.name, normalize_expression(expr)), expr)
+    for tbl in model.tables:
+        t = tbl.name
+        index[('table', '', t)] = (fingerprint(t), '')
+        for m in tbl.measures:
+            expr = m.expression
+            index[('measure', t, m.name)] = (fingerprint(m.name, normalize_expression(expr)), expr)
+        for c in tbl.calculated_columns:
+            expr = c.expression
+            index[('calculated_column', t, c.name)] = (fingerprint(c.name, normalize_expression(expr)), expr)
+        for p in tbl.partitions:
+            text = f"{p.mode} / {p.source_type}\n{p.source_expression}".rstrip()
+            fp = fingerprint(p.name, str(p.mode), p.source_type, normalize_expression(p.source_expression))
+            index[('partition', t, p.name)] = (fp, text)
+        for h in tbl.hierarchies:
+            levels = ', '.join(h.levels)
+            index[('hierarchy', t, h.name)] = (fingerprint(h.name, levels), levels)
+    return index
+
+def diff_metadata(old, new):
+    """
+    Compare deux extractions (Model) et retourne uniquement
+    les objets ajoutés, supprimés ou modifiés.
+    """
+    old_index = index_objects(old)
+    new_index = index_objects(new)
+
+    def entry(key, **texts):
+        kind, table, name = key
+        return {'kind': kind, 'table': table, 'name': name, **texts}
+
+    added = [entry(k, new=new_index[k][1]) for k in new_index.keys() - old_index.keys()]
+    removed = [entry(k, old=old_index[k][1]) for k in old_index.keys() - new_index.keys()]
+    changed = [
+        entry(k, old=old_index[k][1], new=new_index[k][1])
+        for k in old_index.keys() & new_index.keys()
+        if old_index[k][0] != new_index[k][0]
+    ]
+    order = list(KIND_LABELS)
+    sort_key = lambda e: (e['table'], order.index(e['kind']), e['name'])
+    return {
+        'added': sorted(added, key=sort_key),
+        'removed': sorted(removed, key=sort_key),
+        'changed': sorted(changed, key=sort_key),
+    }
+
+def load_metadata(source: Path):
+    """
+    Charge une extraction à comparer : un .pbit (lu et décodé), un projet PBIP
+    (voir pbip.find_project) ou une extraction JSON en cache ou rendue (voir
+    Model.to_dict) ; retourne un Model.
+    """
+    source = Path(source)
+    if source.suffix.lower() == '.json':
+        return Model.from_dict(EncodeJSON.loads(source.read_bytes()))
+    if source.is_dir():
+        project = pbip.find_project(source)
+        if project is None:
+            raise SystemExit(f"Aucun projet PBIP dans {source}")
+        items, _ = pbip.PbipProject(project[0]).load()
+        return autodoc.extract_model(items)
+    with UnzipPBIP.PbitArchive(source) as archive:
+        raw = archive.read(UnzipPBIP.SCHEMA_MEMBER)
+    if raw is None:
+        raise SystemExit(f"DataModelSchema introuvable dans {source}")
+    return autodoc.extract_model(EncodeJSON.iter_model_items(raw))
+
+def _object_label(e):
+    label = KIND_LABELS[e['kind']]
+    return f"{label} : {e['table']}[{e['name']}]" if e['table'] else f"{label} : {e['name']}"
+
+def write_diff_json(diff, path: Path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(diff, f, ensure_ascii=False, indent=4)
+    print(f"Différences JSON enregistrées : {path}")
+
+def write_diff_word(diff, path: Path, old_name='', new_name=''):
+    doc = Document()
+    doc.add_heading('Différences entre deux versions du modèle Power BI', level=0)
+    if old_name or new_name:
+        doc.add_paragraph(f"Ancienne version : {old_name}\nNouvelle version : {new_name}")
+    doc.add_paragraph(
+        f"{len(diff['added'])} ajout(s), {len(diff['removed'])} suppression(s), "
+        f"{len(diff['changed'])} modification(s)."
+    )
+
+    if diff['added']:
+        doc.add_heading('Objets ajoutés', level=1)
+        autodoc.add_styled_table(doc, ['Objet', 'Expression'], [(_object_label(e), e['new']) for e in diff['added']])
+        doc.add_paragraph()
+
+    if diff['removed']:
+        doc.add_heading('Objets supprimés', level=1)
+        autodoc.add_styled_table(doc, ['Objet', 'Expression'], [(_object_label(e), e['old']) for e in diff['removed']])
+        doc.add_paragraph()
+
+    if diff['changed']:
+        doc.add_heading('Objets modifiés', level=1)
+        rows = [(_object_label(e), e['old'], e['new']) for e in diff['changed']]
+        autodoc.add_styled_table(doc, ['Objet', 'Avant', 'Après'], rows, code_columns=(1, 2))
+        doc.add_paragraph()
+
+    doc.save(path)
+    print(f"Différences Word enregistrées : {path}")
+
+def run_diff(old_source: Path, new_source: Path, output_prefix: Path):
+    """Compare deux versions et écrit <préfixe>.docx et <préfixe>.json ; retourne le diff."""
+    old_source, new_source, output_prefix = Path(old_source), Path(new_source), Path(output_prefix)
+    diff = diff_metadata(load_metadata(old_source), load_metadata(new_source))
+    write_diff_json(diff, output_prefix.with_suffix('.json'))
+    write_diff_word(diff, output_prefix.with_suffix('.docx'), old_source.name, new_source.name)
+    return diff
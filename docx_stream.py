@@ -0,0 +1,157 @@
+import itertools
+import re
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from xml.sax.saxutils import quoteattr
+
+import docx
+
+from autodoc import iter_table_blocks, run_xml, table_xml
+
+# Modèle .docx vierge de python-docx : styles, thème, réglages… repris tels quels
+TEMPLATE_PATH = Path(docx.__file__).resolve().parent / 'templates' / 'default.docx'
+DOCUMENT_PART = 'word/document.xml'
+
+# Identifiants des styles de paragraphe du modèle (nom affiché → styleId)
+STYLE_IDS = {'Intense Quote': 'IntenseQuote', 'Title': 'Title'}
+
+
+def _style_id(name):
+    return STYLE_IDS.get(name, name.replace(' ', ''))
+
+def _paragraph_xml(text, style=None):
+    ppr = f'<w:pPr><w:pStyle w:val={quoteattr(_style_id(style))}/></w:pPr>' if style else ''
+    run = run_xml(text, '') if text else ''
+    return f'<w:p>{ppr}{run}</w:p>'
+
+def block_xml(block, col_width):
+    """XML WordprocessingML d'un bloc de autodoc.iter_model_blocks."""
+    kind = block[0]
+    if kind == 'heading':
+        style = 'Title' if block[2] == 0 else f'Heading{block[2]}'
+        return _paragraph_xml(block[1], style)
+    if kind == 'paragraph':
+        return _paragraph_xml(block[1], block[2])
+    if kind == 'table':
+        headers = block[1]
+        return table_xml(headers, block[2], col_width // len(headers), block[3])
+    if kind == 'page_break':
+        return '<w:p><w:r><w:br w:type="page"/></w:r></w:p>'
+    if kind == 'xml':
+        return block[1]
+    raise ValueError(f"Bloc inconnu : {kind!r}")
+
+
+def _block_width(sect_pr):
+    """Largeur utile de la page en twips (largeur moins marges gauche et droite)."""
+    page = int(re.search(r'<w:pgSz[^>]*w:w="(\d+)"', sect_pr).group(1))
+    left = int(re.search(r'<w:pgMar[^>]*w:left="(\d+)"', sect_pr).group(1))
+    right = int(re.search(r'<w:pgMar[^>]*w:right="(\d+)"', sect_pr).group(1))
+    return page - left - right
+
+def template_block_width(template_path: Path = TEMPLATE_PATH):
+    """Largeur utile (twips) du modèle vierge, celui qu'utilisent aussi Document() et StreamingDocxWriter."""
+    with zipfile.ZipFile(template_path, 'r') as template:
+        document = template.read(DOCUMENT_PART).decode('utf-8')
+    return _block_width(document[document.index('<w:sectPr'):])
+
+
+# ——— Rendu parallèle des sections de tables ———
+def section_xml(tbl, col_width):
+    """XML complet de la section d'une table usuelle (titre, mesures, colonnes, partitions, hiérarchies)."""
+    return ''.join(block_xml(block, col_width) for block in iter_table_blocks(tbl))
+
+def iter_parallel_sections(tables, workers, col_width=None):
+    """
+    Sections des tables sous forme de blocs ('xml', fragment), construites dans un
+    pool de workers processus et produites dans l'ordre d'origine des tables.
+    Au plus workers * 2 sections sont en cours ou en attente d'écriture : la
+    table suivante n'est soumise qu'une fois la plus ancienne section consommée,
+    ce qui garde la mémoire bornée en écriture en flux.
+    """
+    col_width = col_width or template_block_width()
+    tables = iter(tables)
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for tbl in itertools.islice(tables, workers * 2):
+            pending.append(executor.submit(section_xml, tbl, col_width))
+        while pending:
+            fragment = pending.popleft().result()
+            yield [('xml', fragment)]
+            for tbl in itertools.islice(tables, 1):
+                pending.append(executor.submit(section_xml, tbl, col_width))
+
+
+class StreamingDocxWriter:
+    """
+    Écrit un .docx en flux : toutes les parties du modèle vierge sont recopiées,
+    puis word/document.xml est compressé au fil de l'eau dans le conteneur zip,
+    bloc par bloc. La mémoire reste bornée par le plus gros bloc (une table).
+    En cas d'erreur dans le bloc with, aucun document incomplet n'est laissé.
+
+        with StreamingDocxWriter(path) as writer:
+            writer.write_blocks(iter_model_blocks(model))
+    """
+
+    def __init__(self, output_path: Path, template_path: Path = TEMPLATE_PATH):
+        self.output_path = Path(output_path)
+        with zipfile.ZipFile(template_path, 'r') as template:
+            document = template.read(DOCUMENT_PART).decode('utf-8')
+            self._zip = zipfile.ZipFile(self.output_path, 'w', zipfile.ZIP_DEFLATED)
+            for member in template.infolist():
+                if member.filename != DOCUMENT_PART:
+                    self._zip.writestr(member, template.read(member))
+
+        # En-tête (déclarations d'espaces de noms) et propriétés de section du modèle
+        body_start = document.index('<w:body>') + len('<w:body>')
+        sect_start = document.index('<w:sectPr')
+        self._head = document[:body_start]
+        self._tail = document[sect_start:]
+        self.col_width = _block_width(self._tail)
+
+        self._stream = self._zip.open(DOCUMENT_PART, 'w', force_zip64=True)
+        self._stream.write(self._head.encode('utf-8'))
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, xml):
+        """Écrit un fragment XML déjà construit dans le corps du document."""
+        self._stream.write(xml.encode('utf-8'))
+
+    def write_blocks(self, blocks):
+        for block in blocks:
+            self.write(block_xml(block, self.col_width))
+
+    def close(self):
+        if self._stream is None:
+            return
+        self._stream.write(self._tail.encode('utf-8'))
+        self._stream.close()
+        self._stream = None
+        self._zip.close()
+
+    def abort(self):
+        """Abandonne l'écriture (erreur en cours) : le fichier incomplet est supprimé."""
+        if self._stream is None:
+            return
+        self._stream.close()
+        self._stream = None
+        self._zip.close()
+        self.output_path.unlink(missing_ok=True)
+
+
+def generate_word_streaming(blocks, output_path: Path):
+    """Écrit directement les blocs dans un .docx, sans construire l'arbre du document en mémoire."""
+    with StreamingDocxWriter(output_path) as writer:
+        writer.write_blocks(blocks)
+    print(f"Documentation Word générée (écriture en flux) : {output_path}")
@@ -0,0 +1,225 @@
+import re
+from collections import deque
+
+# ——— Découpage lexical DAX ———
+# Une seule expression régulière parcourt l'expression de gauche à droite :
+# le découpage est linéaire en la taille du texte.
+_TOKEN = re.compile(r"""
+    (?P<comment>//[^\n]*|--[^\n]*|/\*.*?(?:\*/|\Z))
+  | (?P<string>"[^"]*(?:""[^"]*)*")
+  | (?P<table>'[^']*(?:''[^']*)*')
+  | (?P<bracket>\[[^\]]*(?:\]\][^\]]*)*\])
+  | (?P<name>[^\W\d][\w.]*)
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+)
+  | (?P<space>\s+)
+  | (?P<op>.)
+""", re.S | re.X)
+
+# Mots-clés qui peuvent précéder une référence [X] sans la qualifier
+KEYWORDS = frozenset(('VAR', 'RETURN', 'IN', 'NOT', 'AND', 'OR', 'DEFINE', 'EVALUATE', 'MEASURE',
+                      'COLUMN', 'TABLE', 'ORDER', 'BY', 'ASC', 'DESC', 'START', 'AT'))
+
+# Libellés des types de nœuds du graphe
+KIND_LABELS = {'table': 'Table', 'measure': 'Mesure', 'column': 'Colonne'}
+
+
+def tokenize(expr):
+    """
+    Découpe une expression DAX en (type, valeur). Les noms entre apostrophes
+    ('Table') et entre crochets ([Colonne]) sont rendus sans délimiteurs.
+    """
+    for match in _TOKEN.finditer(expr or ''):
+        kind = match.lastgroup
+        value = match.group()
+        if kind == 'table':
+            value = value[1:-1].replace("''", "'")
+        elif kind == 'bracket':
+            value = value[1:-1].replace(']]', ']')
+        yield kind, value
+
+def references(expr, table_names=frozenset()):
+    """
+    Références d'une expression DAX, dans l'ordre d'apparition :
+    ('column', table, nom) pour Table[Nom], ('bare', '', nom) pour [Nom] seul
+    (mesure ou colonne de la table courante) et ('table', '', nom) pour une table
+    citée seule ('Table', ou un nom de table_names qui n'est pas un appel de fonction).
+    """
+    # Jetons significatifs : (type, valeur, collé au jeton précédent)
+    tokens = []
+    adjacent = False
+    for kind, value in tokenize(expr):
+        if kind in ('space', 'comment'):
+            adjacent = False
+            continue
+        tokens.append((kind, value, adjacent))
+        adjacent = True
+
+    def qualifies(qualifier, bracket):
+        kind, value, _ = qualifier
+        if kind == 'table':
+            return True
+        return kind == 'name' and value.upper() not in KEYWORDS and (bracket[2] or value in table_names)
+
+    for i, token in enumerate(tokens):
+        kind, value, _ = token
+        following = tokens[i + 1] if i + 1 < len(tokens) else None
+        if kind == 'bracket':
+            previous = tokens[i - 1] if i else None
+            if previous is not None and qualifies(previous, token):
+                yield ('column', previous[1], value)
+            else:
+                yield ('bare', '', value)
+        elif kind in ('table', 'name'):
+            if following is not None and following[0] == 'bracket' and qualifies(token, following):
+                continue
+            if kind == 'table' or (value in table_names and not (following and following[1] == '(')):
+                yield ('table', '', value)
+
+
+# ——— Graphe de dépendances ———
+_IDENTIFIER = re.compile(r'[^\W\d]\w*')
+
+def quote_table(name, always=False):
+    """Nom de table DAX : tel quel s'il s'agit d'un identifiant simple, sinon 'Nom' (' doublé)."""
+    if not always and _IDENTIFIER.fullmatch(name) and name.upper() not in KEYWORDS:
+        return name
+    return "'" + name.replace("'", "''") + "'"
+
+def quote_bracket(name):
+    return '[' + name.replace(']', ']]') + ']'
+
+def label(node):
+    """Libellé DAX d'un nœud : [Mesure], Table[Colonne] (ou 'Table 1'[Colonne]) ou 'Table'."""
+    kind, table, name = node
+    if kind == 'measure':
+        return quote_bracket(name)
+    if kind == 'column':
+        return quote_table(table) + quote_bracket(name)
+    return quote_table(name, always=True)
+
+
+class DependencyGraph:
+    """
+    Graphe de dépendances du modèle en listes d'adjacence, dans les deux sens.
+    Les nœuds sont des tuples (type, table, nom) : ('measure', table, nom),
+    ('column', table, nom) ou ('table', '', nom).
+    """
+
+    def __init__(self):
+        self.depends_on = {}    # nœud → dépendances directes (amont)
+        self.used_by = {}       # nœud → dépendants directs (aval)
+
+    def add_node(self, node):
+        if node not in self.depends_on:
+            self.depends_on[node] = []
+            self.used_by[node] = []
+
+    def add_edge(self, node, dependency):
+        """node dépend de dependency."""
+        self.add_node(node)
+        self.add_node(dependency)
+        self.depends_on[node].append(dependency)
+        self.used_by[dependency].append(node)
+
+    def nodes(self):
+        return list(self.depends_on)
+
+    def edge_count(self):
+        return sum(len(deps) for deps in self.depends_on.values())
+
+    @staticmethod
+    def _walk(start, adjacency):
+        """Parcours en largeur : chaque arête est suivie au plus une fois."""
+        seen = {start}
+        order = []
+        queue = deque([start])
+        while queue:
+            for nxt in adjacency.get(queue.popleft(), ()):
+                if nxt not in seen:
+                    seen.add(nxt)
+                    order.append(nxt)
+                    queue.append(nxt)
+        return order
+
+    def upstream(self, node):
+        """Tout ce dont node dépend, directement ou non."""
+        return self._walk(node, self.depends_on)
+
+    def downstream(self, node):
+        """Tout ce qui dépend de node, directement ou non (analyse d'impact)."""
+        return self._walk(node, self.used_by)
+
+
+def _resolve(model, ref, home_table):
+    """Nœud désigné par une référence ; home_table est la table de l'objet qui la contient."""
+    kind, table, name = ref
+    if kind == 'table':
+        return ('table', '', name)
+    if kind == 'column':
+        tbl, measure = model.measure(name, table)
+        return ('measure', tbl.name, name) if measure is not None else ('column', table, name)
+    tbl, measure = model.measure(name)
+    if measure is not None:
+        return ('measure', tbl.name, name)
+    return ('column', home_table, name) if home_table else None
+
+def table_names_of(model):
+    return frozenset(t.name for t in model.tables) | frozenset(c.name for c in model.calc_tables)
+
+def model_expressions(model):
+    """Itère sur (nœud, table de l'objet, expression) des objets calculés du Model."""
+    for calc in model.calc_tables:
+        yield ('table', '', calc.name), None, calc.expression
+    for tbl in model.tables:
+        for m in tbl.measures:
+            yield ('measure', tbl.name, m.name), tbl.name, m.expression
+        for col in tbl.calculated_columns:
+            yield ('column', tbl.name, col.name), tbl.name, col.expression
+
+def build_graph(model):
+    """Construit le graphe de dépendances des mesures, colonnes calculées et tables calculées."""
+    table_names = table_names_of(model)
+    graph = DependencyGraph()
+    for node, home_table, expr in model_expressions(model):
+        graph.add_node(node)
+        seen = {node}
+        for ref in references(expr, table_names):
+            dependency = _resolve(model, ref, home_table)
+            if dependency is not None and dependency not in seen:
+                seen.add(dependency)
+                graph.add_edge(node, dependency)
+    return graph
+
+def find_node(model, graph, text):
+    """Nœud désigné par un libellé DAX saisi par l'utilisateur ([Mesure], Table[Colonne], 'Table')."""
+    table_names = table_names_of(model)
+    for ref in references(text, table_names):
+        node = _resolve(model, ref, None)
+        if node in graph.depends_on:
+            return node
+    return None
+
+
+# ——— Rendu ———
+def iter_lineage_blocks(graph):
+    """Blocs de la section « Lignage » : dépendances directes de chaque objet, dans les deux sens."""
+    rows = [
+        (label(node), KIND_LABELS[node[0]],
+         '\n'.join(label(d) for d in graph.depends_on[node]),
+         '\n'.join(label(u) for u in graph.used_by[node]))
+        for node in graph.nodes()
+        if graph.depends_on[node] or graph.used_by[node]
+    ]
+    if not rows:
+        return
+    yield ('heading', 'Lignage des objets du modèle', 1)
+    yield ('table', ['Objet', 'Type', 'Dépend de', 'Utilisé par'], rows, ())
+    yield ('paragraph', '', None)
+
+def lineage_to_dict(graph):
+    """Forme sérialisable du graphe : dépendances directes de chaque objet qui en a."""
+    return [
+        {'object': label(node), 'kind': node[0], 'depends_on': [label(d) for d in deps]}
+        for node, deps in graph.depends_on.items()
+        if deps
+    ]
@@ -0,0 +1,143 @@
+import cProfile
+import hashlib
+import os
+import re
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+from EncodeJSON import dumps
+
+
+class Stage:
+    """Étape en cours de mesure : l'appelant y renseigne octets lus/écrits et compteurs."""
+
+    __slots__ = ('name', 'bytes_read', 'bytes_written', 'counts', 'info')
+
+    def __init__(self, name):
+        self.name = name
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.counts = {}    # nombres d'objets : tables, mesures, lignes rendues…
+        self.info = {}      # autres informations utiles au diagnostic (encodage détecté…)
+
+
+class MetricsRecorder:
+    """
+    Mesures structurées par étape d'un rapport : temps réel, temps CPU du thread,
+    octets lus et écrits, pic mémoire (tracemalloc) et compteurs d'objets.
+    Les mesures sont ajoutées à un fichier JSON lines (une ligne par étape) à la
+    fermeture ; avec profile_dir, chaque étape est aussi profilée avec cProfile
+    (<profile_dir>/<rapport>-<empreinte du chemin>_<étape>.prof, à ouvrir avec
+    pstats ou snakeviz : deux rapports du même nom ne s'écrasent pas).
+    Sans fichier ni dossier de profils, les étapes ne coûtent rien.
+
+        recorder = MetricsRecorder('rapport.pbit', 'metrics.jsonl')
+        with recorder.stage('lecture') as stage:
+            raw = archive.read(...)
+            stage.bytes_read = len(raw)
+        recorder.close()
+
+    Le pic mémoire est celui du processus pendant l'étape. Une étape concurrent
+    englobe des étapes exécutées en parallèle dans d'autres threads (branches
+    modèle et layout) : seul son propre pic est mesuré, pas celui des étapes
+    qu'elle contient, qui se recouvrent.
+    """
+
+    def __init__(self, report='', path=None, profile_dir=None, source=None):
+        self.report = report
+        # Chemin complet du rapport : distingue deux rapports du même nom
+        self.source = str(Path(source).resolve()) if source else None
+        self.path = Path(path) if path else None
+        self.profile_dir = Path(profile_dir) if profile_dir else None
+        self.run_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{os.getpid()}"
+        self.records = []
+        self._lock = threading.Lock()
+        self._concurrent = 0    # étapes concurrent en cours
+        self._owns_tracemalloc = False
+        if self.path is not None and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+
+    @property
+    def enabled(self):
+        return self.path is not None or self.profile_dir is not None
+
+    @contextmanager
+    def stage(self, name, concurrent=False):
+        stage = Stage(name)
+        if not self.enabled:
+            yield stage
+            return
+
+        profiler = cProfile.Profile() if self.profile_dir is not None and not concurrent else None
+        # Pas de pic mémoire propre à une étape exécutée en même temps que d'autres
+        tracing = tracemalloc.is_tracing() and not self._concurrent
+        if tracing and hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        error = None
+        wall, cpu = time.perf_counter(), time.thread_time()
+        if profiler is not None:
+            profiler.enable()
+        if concurrent:
+            self._concurrent += 1
+        try:
+            yield stage
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if concurrent:
+                self._concurrent -= 1
+            if profiler is not None:
+                profiler.disable()
+            record = {
+                'run': self.run_id,
+                'report': self.report,
+                'source': self.source,
+                'stage': name,
+                'wall_s': round(time.perf_counter() - wall, 6),
+                'cpu_s': round(time.thread_time() - cpu, 6),
+                'bytes_read': stage.bytes_read,
+                'bytes_written': stage.bytes_written,
+                'peak_bytes': tracemalloc.get_traced_memory()[1] if tracing else None,
+                'counts': stage.counts,
+                **stage.info,
+            }
+            if error:
+                record['error'] = error
+            with self._lock:
+                self.records.append(record)
+            if profiler is not None:
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                profiler.dump_stats(self.profile_dir / f"{self._profile_stem()}_{_file_stem(name)}.prof")
+
+    def _profile_stem(self):
+        stem = _file_stem(self.report)
+        if self.source is None:
+            return stem
+        return f"{stem}-{hashlib.sha1(self.source.encode('utf-8')).hexdigest()[:8]}"
+
+    def close(self):
+        """Écrit les mesures (ajout en fin de fichier, en une seule écriture) et arrête tracemalloc."""
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+        if self.path is None or not self.records:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            lines = ''.join(dumps(record) + '\n' for record in self.records)
+            self.records = []
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+
+def _file_stem(name):
+    return re.sub(r'[^\w.-]+', '_', name) or 'rapport'
+
+# Enregistreur inactif, utilisé quand aucune mesure n'est demandée
+NULL_RECORDER = MetricsRecorder()
@@ -0,0 +1,210 @@
+import sys
+
+
+def _intern(name):
+    """Noms d'objets internés : une seule copie de chaque nom, comparaisons par identité."""
+    return sys.intern(name) if isinstance(name, str) else name
+
+
+class _Record:
+    """Objet du modèle à attributs fixes (__slots__), sérialisable en dict pour le cache et le JSON."""
+
+    __slots__ = ()
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{field: data.get(field) for field in cls.__slots__})
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.name!r})"
+
+
+class Measure(_Record):
+    __slots__ = ('name', 'expression')
+
+    def __init__(self, name, expression=''):
+        self.name = _intern(name)
+        self.expression = expression
+
+
+class Column(_Record):
+    """Colonne de la table (données, calculée…), avec sa colonne de tri éventuelle."""
+
+    __slots__ = ('name', 'type', 'sort_by')
+
+    def __init__(self, name, type=None, sort_by=None):
+        self.name = _intern(name)
+        self.type = _intern(type)
+        self.sort_by = _intern(sort_by)
+
+
+class CalculatedColumn(_Record):
+    __slots__ = ('name', 'expression')
+
+    def __init__(self, name, expression=''):
+        self.name = _intern(name)
+        self.expression = expression
+
+
+class CalculatedTable(_Record):
+    __slots__ = ('name', 'expression')
+
+    def __init__(self, name, expression=''):
+        self.name = _intern(name)
+        self.expression = expression
+
+
+class Partition(_Record):
+    __slots__ = ('name', 'mode', 'source_type', 'source_expression')
+
+    def __init__(self, name, mode=None, source_type='', source_expression=''):
+        self.name = _intern(name)
+        self.mode = _intern(mode)
+        self.source_type = _intern(source_type)
+        self.source_expression = source_expression
+
+
+class Hierarchy(_Record):
+    """Hiérarchie : noms de ses niveaux et colonnes correspondantes."""
+
+    __slots__ = ('name', 'levels', 'columns')
+
+    def __init__(self, name, levels=(), columns=()):
+        self.name = _intern(name)
+        self.levels = [_intern(level) for level in levels or ()]
+        self.columns = [_intern(column) for column in columns or ()]
+
+
+class Relationship(_Record):
+    __slots__ = ('name', 'from_table', 'from_column', 'to_table', 'to_column')
+
+    def __init__(self, name, from_table, from_column, to_table, to_column):
+        self.name = _intern(name)
+        self.from_table = _intern(from_table)
+        self.from_column = _intern(from_column)
+        self.to_table = _intern(to_table)
+        self.to_column = _intern(to_column)
+
+
+class Table(_Record):
+    """Table usuelle du modèle, avec ses objets indexés par nom."""
+
+    __slots__ = ('name', 'columns', 'measures', 'calculated_columns', 'partitions', 'hierarchies',
+                 '_columns', '_measures', '_calculated_columns')
+    _CHILDREN = {
+        'columns': Column,
+        'measures': Measure,
+        'calculated_columns': CalculatedColumn,
+        'partitions': Partition,
+        'hierarchies': Hierarchy,
+    }
+
+    def __init__(self, name, measures=(), calculated_columns=(), partitions=(), hierarchies=(), columns=()):
+        self.name = _intern(name)
+        self.columns = list(columns or ())
+        self.measures = list(measures or ())
+        self.calculated_columns = list(calculated_columns or ())
+        self.partitions = list(partitions or ())
+        self.hierarchies = list(hierarchies or ())
+        self._columns = {c.name: c for c in self.columns}
+        self._measures = {m.name: m for m in self.measures}
+        self._calculated_columns = {c.name: c for c in self.calculated_columns}
+
+    def column(self, name):
+        return self._columns.get(name)
+
+    def measure(self, name):
+        return self._measures.get(name)
+
+    def calculated_column(self, name):
+        return self._calculated_columns.get(name)
+
+    def to_dict(self):
+        data = {'name': self.name}
+        for field in self._CHILDREN:
+            data[field] = [child.to_dict() for child in getattr(self, field)]
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        children = {
+            field: [child_cls.from_dict(child) for child in data.get(field) or ()]
+            for field, child_cls in cls._CHILDREN.items()
+        }
+        return cls(data.get('name'), **children)
+
+
+class Model:
+    """
+    Modèle documenté : tables usuelles, tables calculées et relations, dans l'ordre
+    du schéma, indexées par nom de table et par nom de mesure (unique dans un
+    modèle Power BI).
+    """
+
+    __slots__ = ('tables', 'calc_tables', 'relationships', '_tables', '_calc_tables', '_measures')
+
+    def __init__(self, tables=(), calc_tables=(), relationships=()):
+        self.tables = list(tables)
+        self.calc_tables = list(calc_tables)
+        self.relationships = list(relationships)
+        self._tables = {t.name: t for t in self.tables}
+        self._calc_tables = {c.name: c for c in self.calc_tables}
+        self._measures = {m.name: (t, m) for t in self.tables for m in t.measures}
+
+    def table(self, name):
+        """Table usuelle nommée name (None si absente)."""
+        return self._tables.get(name)
+
+    def calc_table(self, name):
+        return self._calc_tables.get(name)
+
+    def measure(self, name, table=None):
+        """Retourne (table, mesure) ; sans table, la mesure est cherchée dans tout le modèle."""
+        if table is None:
+            return self._measures.get(name, (None, None))
+        tbl = self._tables.get(table)
+        m = tbl.measure(name) if tbl is not None else None
+        return (tbl, m) if m is not None else (None, None)
+
+    def measures(self):
+        """Itère sur (table, mesure) pour toutes les mesures du modèle."""
+        for tbl in self.tables:
+            for m in tbl.measures:
+                yield tbl, m
+
+    def counts(self):
+        """Nombre d'objets par type (pour les mesures de performance)."""
+        return {
+            'tables': len(self.tables),
+            'calc_tables': len(self.calc_tables),
+            'relationships': len(self.relationships),
+            'measures': sum(len(t.measures) for t in self.tables),
+            'columns': sum(len(t.columns) for t in self.tables),
+            'calculated_columns': sum(len(t.calculated_columns) for t in self.tables),
+            'partitions': sum(len(t.partitions) for t in self.tables),
+        }
+
+    def __eq__(self, other):
+        return isinstance(other, Model) and self.to_dict() == other.to_dict()
+
+    def to_dict(self):
+        """Forme sérialisable (celle du cache et du rendu JSON) : {'tables': [...], 'calc_tables': [...], ...}."""
+        return {
+            'tables': [t.to_dict() for t in self.tables],
+            'calc_tables': [c.to_dict() for c in self.calc_tables],
+            'relationships': [r.to_dict() for r in self.relationships],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            [Table.from_dict(t) for t in data.get('tables') or ()],
+            [CalculatedTable.from_dict(c) for c in data.get('calc_tables') or ()],
+            [Relationship.from_dict(r) for r in data.get('relationships') or ()],
+        )
@@ -0,0 +1,365 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import EncodeJSON
+import LayoutFinder
+
+# Suffixes des dossiers d'un projet PBIP (Power BI Desktop, format projet)
+MODEL_SUFFIXES = ('.SemanticModel', '.Dataset')
+REPORT_SUFFIX = '.Report'
+# Définition du modèle : TMSL en un seul fichier, ou TMDL en un fichier par table
+BIM_FILE = 'model.bim'
+TMDL_DIR = 'definition'
+# Définition du rapport au format PBIR-Legacy (même contenu que Report/Layout d'un .pbit)
+REPORT_FILE = 'report.json'
+# Nombre de threads de lecture par défaut (lectures de nombreux petits fichiers)
+DEFAULT_READERS = min(32, (os.cpu_count() or 1) + 4)
+
+
+# ——— Lecture TMDL ———
+# Le TMDL décrit le modèle par indentation : objets (« measure 'Nom' = expression »),
+# propriétés (« dataType: int64 ») et expressions multilignes, indentées de deux
+# niveaux sous la ligne qui les introduit. Les objets sont convertis dans la forme
+# TMSL du DataModelSchema (voir autodoc.extract_table).
+_PROPERTY = re.compile(r'([A-Za-z]\w*)\s*:\s*(.*)')
+_EXPRESSION_PROPERTY = re.compile(r'([A-Za-z]\w*)\s*=\s*(.*)')
+_FLAG = re.compile(r'[A-Za-z]\w*')
+
+
+class TmdlNode:
+    """Objet TMDL : type, nom, valeur après « = », propriétés et objets enfants."""
+
+    __slots__ = ('type', 'name', 'value', 'properties', 'children')
+
+    def __init__(self, type, name='', value=None):
+        self.type = type
+        self.name = name
+        self.value = value
+        self.properties = {}
+        self.children = []
+
+    def iter(self, type):
+        return (child for child in self.children if child.type == type)
+
+
+def _level(line):
+    """Niveau d'indentation : tabulations, ou groupes de 4 espaces."""
+    stripped = line.lstrip('\t')
+    tabs = len(line) - len(stripped)
+    return tabs + (len(stripped) - len(stripped.lstrip(' '))) // 4
+
+def _read_name(text):
+    """Lit un nom TMDL en tête de text ('Nom avec espaces' ou Nom) ; retourne (nom, reste)."""
+    if text.startswith("'"):
+        i = 1
+        while i < len(text):
+            if text[i] == "'":
+                if text[i + 1:i + 2] == "'":
+                    i += 2
+                    continue
+                return text[1:i].replace("''", "'"), text[i + 1:]
+            i += 1
+        return text[1:].replace("''", "'"), ''
+    match = re.match(r'[^\s=]+', text)
+    name = match.group() if match else ''
+    return name, text[len(name):]
+
+def unquote(name):
+    return _read_name(name.strip())[0]
+
+def split_column_ref(ref):
+    """'Table'.'Colonne' ou Table.Colonne → (table, colonne)."""
+    ref = ref.strip()
+    if ref.startswith("'"):
+        table, rest = _read_name(ref)
+        return table, unquote(rest[1:]) if rest.startswith('.') else ''
+    table, _, column = ref.partition('.')
+    return table, unquote(column)
+
+def _dedent(lines):
+    lines = [line.rstrip() for line in lines]
+    while lines and not lines[-1]:
+        lines.pop()
+    indents = [len(line) - len(line.lstrip()) for line in lines if line.strip()]
+    cut = min(indents) if indents else 0
+    return '\n'.join(line[cut:] for line in lines)
+
+def _read_expression(lines, i, first, min_level):
+    """
+    Expression introduite par « = first » à la ligne i : first seule, ou suivie des
+    lignes indentées d'au moins min_level, ou bloc entre ```. Retourne (expression, ligne suivante).
+    """
+    if first.startswith('```'):
+        body = [first[3:]] if first[3:].strip() else []
+        i += 1
+        while i < len(lines) and not lines[i].rstrip().endswith('```'):
+            body.append(lines[i])
+            i += 1
+        if i < len(lines):
+            body.append(lines[i].rstrip()[:-3])
+        return _dedent(body), i + 1
+    body = []
+    j = i + 1
+    while j < len(lines) and (not lines[j].strip() or _level(lines[j]) >= min_level):
+        body.append(lines[j])
+        j += 1
+    # Les lignes vides finales appartiennent à la suite du fichier
+    while body and not body[-1].strip():
+        body.pop()
+    expression = _dedent(body)
+    if first:
+        expression = f"{first}\n{expression}" if expression else first
+    return expression, i + 1 + len(body)
+
+def parse_tmdl(text):
+    """Arbre des objets d'un fichier TMDL : retourne la liste des objets de premier niveau."""
+    lines = text.splitlines()
+    root = TmdlNode('document')
+    stack = [(-1, root)]
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        content = line.strip()
+        # Lignes vides, commentaires et descriptions (///)
+        if not content or content.startswith('//'):
+            i += 1
+            continue
+        level = _level(line)
+        while stack[-1][0] >= level:
+            stack.pop()
+        parent = stack[-1][1]
+
+        match = _PROPERTY.fullmatch(content)
+        if match:
+            parent.properties[match.group(1)] = match.group(2).strip()
+            i += 1
+            continue
+        match = _EXPRESSION_PROPERTY.fullmatch(content)
+        if match:
+            parent.properties[match.group(1)], i = _read_expression(lines, i, match.group(2).strip(), level + 1)
+            continue
+        if _FLAG.fullmatch(content):
+            parent.properties[content] = True
+            i += 1
+            continue
+
+        # Objet : « type nom [= valeur] » (« ref table Nom » pour les références)
+        type, _, rest = content.partition(' ')
+        if type == 'ref':
+            type, _, rest = rest.partition(' ')
+            type = f"ref {type}"
+        name, rest = _read_name(rest.strip())
+        rest = rest.strip()
+        node = TmdlNode(type, name)
+        if rest.startswith('='):
+            node.value, i = _read_expression(lines, i, rest[1:].strip(), level + 2)
+        else:
+            i += 1
+        parent.children.append(node)
+        stack.append((level, node))
+    return root.children
+
+
+# ——— Conversion TMDL → TMSL ———
+def _column_type(column, calculated_table):
+    if column.value is not None:
+        return 'calculated'
+    if column.properties.get('type'):
+        return column.properties['type']
+    source = column.properties.get('sourceColumn', '')
+    if calculated_table and isinstance(source, str) and source.startswith('['):
+        return 'calculatedTableColumn'
+    return None
+
+def tmdl_table(node):
+    """Table TMDL → dict TMSL (colonnes, mesures, partitions, hiérarchies)."""
+    partitions = []
+    for part in node.iter('partition'):
+        source = {'type': part.value or ''}
+        if 'source' in part.properties:
+            source['expression'] = part.properties['source']
+        partitions.append({'name': part.name, 'mode': part.properties.get('mode'), 'source': source})
+    calculated_table = any(p['source']['type'] == 'calculated' for p in partitions)
+
+    columns = []
+    for col in node.iter('column'):
+        column = {'name': col.name}
+        column_type = _column_type(col, calculated_table)
+        if column_type:
+            column['type'] = column_type
+        if col.value is not None:
+            column['expression'] = col.value
+        if col.properties.get('sortByColumn'):
+            column['sortByColumn'] = unquote(col.properties['sortByColumn'])
+        columns.append(column)
+    return {
+        'name': node.name,
+        'columns': columns,
+        'measures': [{'name': m.name, 'expression': m.value or ''} for m in node.iter('measure')],
+        'partitions': partitions,
+        'hierarchies': [
+            {'name': hier.name,
+             'levels': [{'name': lvl.name, 'column': unquote(lvl.properties.get('column') or lvl.name)}
+                        for lvl in hier.iter('level')]}
+            for hier in node.iter('hierarchy')
+        ],
+    }
+
+def tmdl_relationship(node):
+    from_table, from_column = split_column_ref(node.properties.get('fromColumn', ''))
+    to_table, to_column = split_column_ref(node.properties.get('toColumn', ''))
+    return {'name': node.name, 'fromTable': from_table, 'fromColumn': from_column,
+            'toTable': to_table, 'toColumn': to_column}
+
+def tmdl_items(text):
+    """
+    Paires (membre, élément) d'un fichier TMDL, comme EncodeJSON.iter_model_items :
+    'tables', 'relationships', et 'order' pour l'ordre des tables (ref table de model.tmdl).
+    """
+    items = []
+    for node in parse_tmdl(text):
+        nodes = node.children if node.type in ('model', 'database') else [node]
+        for obj in nodes:
+            if obj.type == 'table':
+                items.append(['tables', tmdl_table(obj)])
+            elif obj.type == 'relationship':
+                items.append(['relationships', tmdl_relationship(obj)])
+            elif obj.type == 'ref table':
+                items.append(['order', obj.name])
+    return items
+
+
+# ——— Projet PBIP ———
+def find_project(root: Path):
+    """
+    Dossiers du modèle et du rapport d'un projet PBIP : root contient un .pbip (ou
+    un dossier .SemanticModel), ou est lui-même le dossier .SemanticModel ou .Report.
+    Retourne (dossier du modèle, dossier du rapport ou None), ou None (y compris
+    si root n'est pas un dossier existant).
+    """
+    root = Path(root)
+    if not root.is_dir():
+        return None
+    if root.suffix in MODEL_SUFFIXES + (REPORT_SUFFIX,):
+        root, stems = root.parent, [root.stem]
+    else:
+        stems = [p.stem for p in sorted(root.glob('*.pbip'))]
+        stems += [p.stem for p in sorted(root.iterdir()) if p.is_dir() and p.suffix in MODEL_SUFFIXES]
+    for stem in stems:
+        for suffix in MODEL_SUFFIXES:
+            model_dir = root / f"{stem}{suffix}"
+            if (model_dir / BIM_FILE).is_file() or (model_dir / TMDL_DIR).is_dir():
+                report_dir = root / f"{stem}{REPORT_SUFFIX}"
+                return model_dir, report_dir if report_dir.is_dir() else None
+    return None
+
+def _parse_model_file(relpath, raw):
+    if relpath.endswith('.bim'):
+        return [list(pair) for pair in EncodeJSON.iter_model_items(raw)]
+    return tmdl_items(EncodeJSON.decode_text(raw, EncodeJSON.detect_encoding(raw)[0]))
+
+def _parse_report_file(raw):
+    layout_model = LayoutFinder.LayoutModel(LayoutFinder.decode_layout(raw))
+    return {
+        'pages': LayoutFinder.extract_pages(layout_model),
+        'usages': LayoutFinder.extract_field_usages(layout_model),
+    }
+
+def items_to_schema(items):
+    """Paires (membre, élément) assemblées par PbipProject.load → DataModelSchema TMSL ({'model': …})."""
+    model = {'tables': [], 'relationships': []}
+    for member, item in items:
+        model[member].append(item)
+    return {'model': model}
+
+
+class PbipProject:
+    """
+    Projet PBIP lu directement sur disque, sans passer par un .pbit : modèle en TMSL
+    (model.bim) ou en TMDL (definition/**/*.tmdl), rapport en PBIR-Legacy (report.json).
+    Les fichiers sont lus et analysés en parallèle sur un pool de threads ; avec un
+    cache (voir cache.ResultCache), le résultat de chaque fichier est conservé avec sa
+    date de modification et sa taille, et un fichier inchangé n'est pas relu (sans
+    cache, tous les fichiers sont relus).
+
+        project = PbipProject(model_dir, report_dir)
+        items, layout = project.load(cache)
+        model = autodoc.extract_model(items)
+    """
+
+    def __init__(self, model_dir: Path, report_dir: Path = None, readers=DEFAULT_READERS):
+        self.model_dir = Path(model_dir)
+        self.report_dir = Path(report_dir) if report_dir else None
+        self.readers = readers
+        self.name = self.model_dir.stem
+        self.stats = {'files': 0, 'read': 0, 'skipped': 0, 'bytes_read': 0}
+
+    def files(self):
+        """Fichiers de la définition : {chemin relatif: chemin}."""
+        files = {}
+        definition = self.model_dir / TMDL_DIR
+        if definition.is_dir():
+            for path in sorted(definition.rglob('*.tmdl')):
+                files[path.relative_to(self.model_dir).as_posix()] = path
+        elif (self.model_dir / BIM_FILE).is_file():
+            files[BIM_FILE] = self.model_dir / BIM_FILE
+        if self.report_dir is not None and (self.report_dir / REPORT_FILE).is_file():
+            files[f"{REPORT_SUFFIX}/{REPORT_FILE}"] = self.report_dir / REPORT_FILE
+        return files
+
+    def _read(self, relpath, path):
+        raw = path.read_bytes()
+        data = _parse_report_file(raw) if relpath.endswith(REPORT_FILE) else _parse_model_file(relpath, raw)
+        return relpath, len(raw), data
+
+    def load(self, cache=None):
+        """
+        Retourne (paires (membre, élément) du modèle, {'pages', 'usages'} du rapport
+        ou None sans report.json). Seuls les fichiers modifiés depuis la dernière
+        lecture enregistrée dans cache sont relus.
+        """
+        key = cache.key('project', str(self.model_dir.resolve())) if cache is not None else None
+        previous = (cache.get_json('projects', key) if cache is not None else None) or {}
+        manifest = {}
+        to_read = {}
+        for relpath, path in self.files().items():
+            st = path.stat()
+            entry = previous.get(relpath)
+            if entry is not None and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+                manifest[relpath] = entry
+            else:
+                to_read[relpath] = (path, st)
+        self.stats.update(files=len(manifest) + len(to_read), read=len(to_read), skipped=len(manifest))
+
+        if to_read:
+            with ThreadPoolExecutor(max_workers=self.readers) as executor:
+                results = executor.map(lambda item: self._read(item[0], item[1][0]), to_read.items())
+                for relpath, size, data in results:
+                    st = to_read[relpath][1]
+                    manifest[relpath] = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'data': data}
+                    self.stats['bytes_read'] += size
+            if cache is not None:
+                cache.put_json('projects', key, manifest)
+
+        layout = None
+        tables = {}
+        order = []
+        relationships = []
+        for relpath in sorted(manifest):
+            data = manifest[relpath]['data']
+            if relpath.endswith(REPORT_FILE):
+                layout = data
+                continue
+            for member, item in data:
+                if member == 'tables':
+                    tables[item.get('name', '')] = item
+                elif member == 'relationships':
+                    relationships.append(item)
+                elif member == 'order':
+                    order.append(item)
+        # Ordre des tables : celui de model.tmdl, puis les autres par nom de fichier
+        ordered = [tables.pop(name) for name in order if name in tables] + list(tables.values())
+        items = [('tables', t) for t in ordered] + [('relationships', r) for r in relationships]
+        return items, layout
@@ -0,0 +1,451 @@
+import glob
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from pathlib import Path
+
+import EncodeJSON
+import LayoutFinder
+import UnzipPBIP
+import autodoc
+import pbip
+import renderers
+import usage
+from cache import ResultCache, digest
+from catalog import Catalog
+from metrics import NULL_RECORDER, MetricsRecorder
+
+# Formats possibles des fichiers JSON de débogage (None : aucun fichier écrit)
+DEBUG_JSON_FORMATS = ('indent', 'compact')
+
+
+def run_model_branch(raw, debug_json=None, debug_path: Path = None, recorder=NULL_RECORDER):
+    """
+    Branche modèle : DataModelSchema → Model (tables, tables calculées).
+    Les tables sont lues en flux, une à une ; le JSON complet n'est construit que
+    pour écrire le fichier de débogage.
+    """
+    if debug_json:
+        with recorder.stage('décodage') as stage:
+            report = EncodeJSON.decode_json(raw)
+            stage.bytes_read = len(raw)
+        EncodeJSON.save_json(report, debug_path, compact=debug_json == 'compact')
+        with recorder.stage('extraction') as stage:
+            model = autodoc.extract_metadata(report)
+            stage.counts.update(model.counts())
+        return model
+
+    with recorder.stage('encodage') as stage:
+        encoding, method = EncodeJSON.detect_encoding(raw)
+        stage.info.update(encoding=encoding, method=method)
+    print(f"Encodage détecté ({method}) : {encoding!r}")
+    with recorder.stage('décodage') as stage:
+        text = EncodeJSON.decode_text(raw, encoding)
+        stage.bytes_read = len(raw)
+        stage.counts['characters'] = len(text)
+    # Lecture en flux : le parsing JSON des tables a lieu pendant l'extraction
+    with recorder.stage('extraction') as stage:
+        model = autodoc.extract_model(EncodeJSON.iter_model_items(text))
+        stage.counts.update(model.counts())
+    return model
+
+def run_layout_branch(raw, debug_json=None, debug_path: Path = None, recorder=NULL_RECORDER):
+    """
+    Branche layout : Layout → JSON → {'pages': liste des pages, 'usages': champs
+    utilisés (voir LayoutFinder.extract_field_usages)}. Sans Layout, pages est vide
+    et usages vaut None.
+    """
+    if raw is None:
+        print("Fichier Layout non trouvé dans le .pbit")
+        return {'pages': [], 'usages': None}
+    with recorder.stage('layout_décodage') as stage:
+        layout = LayoutFinder.decode_layout(raw)
+        stage.bytes_read = len(raw)
+    if debug_json:
+        EncodeJSON.save_json(layout, debug_path, compact=debug_json == 'compact')
+    with recorder.stage('layout_analyse') as stage:
+        layout_model = LayoutFinder.LayoutModel(layout)
+        result = {
+            'pages': LayoutFinder.extract_pages(layout_model),
+            'usages': LayoutFinder.extract_field_usages(layout_model),
+        }
+        stage.counts.update(pages=len(layout_model.pages), visuals=sum(len(p.visuals) for p in layout_model.pages),
+                            field_usages=len(result['usages']))
+    return result
+
+def _cached_model_branch(cache, key, raw, debug_json, debug_path, recorder=NULL_RECORDER):
+    """Branche modèle servie par le cache si le DataModelSchema n'a pas changé."""
+    cached = cache.get_model(key)
+    if cached is not None:
+        print("♻️ Modèle repris du cache")
+        return cached
+    model = run_model_branch(raw, debug_json, debug_path, recorder)
+    cache.put_model(key, model)
+    return model
+
+def _cached_layout_branch(cache, key, raw, debug_json, debug_path, recorder=NULL_RECORDER):
+    """Branche layout servie par le cache si le Layout n'a pas changé."""
+    cached = cache.get_json('layouts', key)
+    if cached is not None:
+        print("♻️ Pages reprises du cache")
+        return cached
+    layout = run_layout_branch(raw, debug_json, debug_path, recorder)
+    cache.put_json('layouts', key, layout)
+    return layout
+
+def run_pipeline(root_dir: Path, output_path: Path = None, debug_json=None, cache: ResultCache = None, stream=False,
+                 formats=('docx',), metrics_path: Path = None, profile_dir: Path = None, render_workers=None,
+                 catalog_path: Path = None):
+    """
+    Documente le premier .pbit de root_dir (voir document_pbit) et retourne la durée
+    de chaque étape. Par défaut, le document est écrit dans root_dir/documentation.docx.
+    """
+    root_dir = Path(root_dir)
+    output_path = Path(output_path) if output_path else root_dir / 'documentation.docx'
+    # Projet PBIP (dossiers .SemanticModel / .Report) lu directement, sans .pbit
+    project = pbip.find_project(root_dir) if not any(root_dir.glob('*.pbit')) else None
+    if project is not None:
+        return document_project(project[0], output_path, report_dir=project[1], debug_json=debug_json, cache=cache,
+                                stream=stream,
+                                formats=formats, metrics_path=metrics_path, profile_dir=profile_dir,
+                                render_workers=render_workers, catalog_path=catalog_path)
+    pbit_path = UnzipPBIP.find_pbit(root_dir)
+    if pbit_path is None:
+        raise SystemExit("Aucun fichier .pbit : documentation impossible.")
+    return document_pbit(pbit_path, output_path, debug_json=debug_json, cache=cache, stream=stream, formats=formats,
+                         metrics_path=metrics_path, profile_dir=profile_dir, render_workers=render_workers,
+                         catalog_path=catalog_path)
+
+def document_pbit(pbit_path: Path, output_path: Path, debug_json=None, cache: ResultCache = None,
+                  debug_prefix='', stream=False, formats=('docx',), metrics_path: Path = None, profile_dir: Path = None,
+                  render_workers=None, catalog_path: Path = None):
+    """
+    Exécute toute la chaîne pour un .pbit dans le processus courant et retourne
+    la durée de chaque étape.
+    Le modèle et le layout transitent en mémoire ; les deux branches indépendantes
+    (modèle → autodoc, layout → pages) tournent en parallèle.
+    debug_json ('indent' ou 'compact') écrit en plus <debug_prefix>fichier_converti.json
+    et <debug_prefix>Layout.json à côté du document de sortie (seulement pour les
+    branches réellement recalculées).
+    Avec un cache, un .pbit déjà documenté est servi directement, et un modèle ou
+    un layout inchangé n'est pas redécodé.
+    Avec stream, le document est écrit en flux, section par section (voir docx_stream).
+    formats liste les moteurs de rendu (voir renderers.RENDERERS) ; chaque format est
+    écrit à côté de output_path avec sa propre extension.
+    metrics_path ajoute les mesures de chaque étape à un fichier JSON lines, et
+    profile_dir y écrit un profil cProfile par étape (voir metrics.MetricsRecorder).
+    render_workers construit les sections des tables du .docx dans autant de
+    processus (voir renderers.render_docx).
+    catalog_path écrit en plus les métadonnées du rapport dans ce catalogue SQLite
+    (voir catalog.Catalog).
+    """
+    pbit_path = Path(pbit_path)
+    recorder = MetricsRecorder(pbit_path.name, metrics_path, profile_dir, source=pbit_path)
+    try:
+        return _document_pbit(pbit_path, Path(output_path), debug_json, cache, debug_prefix, stream, formats, recorder,
+                              render_workers, catalog_path)
+    finally:
+        recorder.close()
+
+def _document_pbit(pbit_path, output_path, debug_json, cache, debug_prefix, stream, formats, recorder,
+                   render_workers=None, catalog_path=None):
+    schema_debug = output_path.with_name(f"{debug_prefix}fichier_converti.json")
+    layout_debug = output_path.with_name(f"{debug_prefix}Layout.json")
+    durations = {}
+    print(f"Fichier source détecté : {pbit_path.name}")
+
+    # 1. Lecture des membres utiles, sur une seule ouverture de l'archive
+    start = time.time()
+    with recorder.stage('lecture') as stage:
+        with UnzipPBIP.PbitArchive(pbit_path) as archive:
+            schema_raw = archive.read(UnzipPBIP.SCHEMA_MEMBER)
+            layout_raw = archive.read(UnzipPBIP.LAYOUT_MEMBER)
+        stage.bytes_read = len(schema_raw or b'') + len(layout_raw or b'')
+    if schema_raw is None:
+        raise SystemExit("DataModelSchema introuvable : documentation impossible.")
+    durations['lecture'] = time.time() - start
+
+    # 2. Document Word déjà produit pour ces mêmes membres : copie directe
+    formats = list(formats)
+    if cache is not None:
+        schema_key = cache.key('model', digest(schema_raw))
+        layout_key = cache.key('layout', digest(layout_raw) if layout_raw is not None else '')
+        report_key = cache.key('report', schema_key, layout_key)
+        cached_doc = cache.get_document(report_key) if 'docx' in formats else None
+        if cached_doc is not None:
+            docx_path = renderers.output_path_for(output_path, 'docx')
+            shutil.copyfile(cached_doc, docx_path)
+            print(f"♻️ Documentation reprise du cache : {docx_path}")
+            formats.remove('docx')
+            # Le catalogue a besoin du modèle : il est alors repris du cache ci-dessous
+            if not formats and catalog_path is None:
+                return durations
+
+    # 3. Branches modèle et layout en parallèle (l'une après l'autre si elles sont
+    # profilées : un seul profileur cProfile peut être actif à la fois)
+    start = time.time()
+    # En parallèle, les deux branches sont mesurées ensemble (pic mémoire commun)
+    workers = 1 if recorder.profile_dir else 2
+    branches = recorder.stage('branches', concurrent=True) if workers > 1 else nullcontext()
+    with branches, ThreadPoolExecutor(max_workers=workers) as executor:
+        if cache is not None:
+            model_future = executor.submit(_cached_model_branch, cache, schema_key, schema_raw, debug_json,
+                                           schema_debug, recorder)
+            layout_future = executor.submit(_cached_layout_branch, cache, layout_key, layout_raw, debug_json,
+                                            layout_debug, recorder)
+        else:
+            model_future = executor.submit(run_model_branch, schema_raw, debug_json, schema_debug, recorder)
+            layout_future = executor.submit(run_layout_branch, layout_raw, debug_json, layout_debug, recorder)
+        model = model_future.result()
+        layout = layout_future.result()
+    usage_index = _usage_index(model, layout, recorder)
+    durations['analyse'] = time.time() - start
+
+    # 4. Rendu dans chaque format demandé
+    start = time.time()
+    _render_formats(model, layout, usage_index, output_path, formats, stream, recorder, render_workers)
+    durations['rendu'] = time.time() - start
+
+    if cache is not None and 'docx' in formats:
+        cache.put_document(report_key, renderers.output_path_for(output_path, 'docx'))
+
+    if catalog_path is not None:
+        report_digest = digest(schema_raw + (layout_raw or b''))
+        _catalog_report(catalog_path, pbit_path, model, layout, report_digest, recorder)
+
+    return durations
+
+
+def _catalog_report(catalog_path, source, model, layout, report_digest, recorder):
+    """Écrit les métadonnées du rapport dans le catalogue SQLite (une transaction)."""
+    with recorder.stage('catalogue') as stage:
+        with Catalog(catalog_path) as catalog:
+            written = catalog.add_report(source, model, layout['pages'], layout['usages'], report_digest)
+        stage.counts['rows'] = written
+    print(f"🗃️ Catalogue {catalog_path} : {written} ligne(s) écrite(s)" if written
+          else f"🗃️ Catalogue {catalog_path} : rapport déjà à jour")
+
+def _usage_index(model, layout, recorder):
+    """Index d'utilisation des objets du modèle par le rapport (seulement s'il a un Layout)."""
+    if layout['usages'] is None:
+        return None
+    with recorder.stage('index_utilisation') as stage:
+        usage_index = usage.UsageIndex(model, layout['usages'])
+        stage.counts['indexed_objects'] = len(usage_index.locations)
+    return usage_index
+
+def _render_formats(model, layout, usage_index, output_path, formats, stream, recorder, render_workers=None):
+    counts = model.counts()
+    rows = counts['measures'] + counts['calculated_columns'] + counts['partitions'] + counts['calc_tables']
+    for fmt in formats:
+        fmt_path = renderers.output_path_for(output_path, fmt)
+        with recorder.stage(f"rendu_{fmt}") as stage:
+            renderers.render(fmt, model, layout['pages'], fmt_path, stream=stream, usage=usage_index,
+                             workers=render_workers)
+            stage.bytes_written = fmt_path.stat().st_size
+            stage.counts.update(sections=counts['tables'], rows=rows + len(layout['pages']))
+
+def document_project(model_dir: Path, output_path: Path, report_dir: Path = None, debug_json=None,
+                     cache: ResultCache = None, stream=False, formats=('docx',), metrics_path: Path = None,
+                     profile_dir: Path = None, render_workers=None, catalog_path: Path = None):
+    """
+    Documente un projet PBIP (voir pbip.PbipProject) sans le recompresser en .pbit
+    et retourne la durée de chaque étape. Seul un cache conserve l'état des fichiers
+    entre deux exécutions : avec lui, seuls les fichiers dont la date de modification
+    ou la taille a changé depuis la dernière exécution sont relus ; sans lui, tous
+    les fichiers sont relus.
+    debug_json ('indent' ou 'compact') écrit en plus, à côté du document de sortie,
+    fichier_converti.json (le modèle assemblé, sous la forme TMSL du DataModelSchema)
+    et pages.json (les pages du rapport).
+    """
+    model_dir = Path(model_dir)
+    recorder = MetricsRecorder(model_dir.name, metrics_path, profile_dir, source=model_dir)
+    try:
+        durations = {}
+        print(f"Projet PBIP détecté : {model_dir.name}")
+        project = pbip.PbipProject(model_dir, report_dir)
+
+        # 1. Lecture et analyse des fichiers modifiés, en parallèle
+        start = time.time()
+        with recorder.stage('lecture') as stage:
+            items, layout = project.load(cache)
+            stage.bytes_read = project.stats['bytes_read']
+            stage.counts.update(files=project.stats['files'], skipped=project.stats['skipped'])
+        if not items:
+            raise SystemExit(f"Définition du modèle introuvable dans {model_dir}")
+        print(f"📂 {project.stats['files']} fichier(s), {project.stats['read']} lu(s), "
+              f"{project.stats['skipped']} inchangé(s)")
+        if layout is None:
+            print("Fichier report.json non trouvé dans le projet")
+            layout = {'pages': [], 'usages': None}
+        durations['lecture'] = time.time() - start
+        if debug_json:
+            compact = debug_json == 'compact'
+            EncodeJSON.save_json(pbip.items_to_schema(items), Path(output_path).with_name('fichier_converti.json'),
+                                 compact=compact)
+            EncodeJSON.save_json(layout['pages'], Path(output_path).with_name('pages.json'), compact=compact)
+
+        # 2. Model et index d'utilisation
+        start = time.time()
+        with recorder.stage('extraction') as stage:
+            model = autodoc.extract_model(items)
+            stage.counts.update(model.counts())
+        usage_index = _usage_index(model, layout, recorder)
+        durations['analyse'] = time.time() - start
+
+        # 3. Rendu dans chaque format demandé
+        start = time.time()
+        _render_formats(model, layout, usage_index, Path(output_path), formats, stream, recorder, render_workers)
+        durations['rendu'] = time.time() - start
+
+        if catalog_path is not None:
+            # Pas d'empreinte : les fichiers inchangés sont déjà sautés à la lecture
+            _catalog_report(catalog_path, model_dir, model, layout, None, recorder)
+        return durations
+    finally:
+        recorder.close()
+
+
+def analyze_usage(pbit_path: Path):
+    """Index d'utilisation (voir usage.UsageIndex) d'un .pbit, sans produire de document."""
+    with UnzipPBIP.PbitArchive(pbit_path) as archive:
+        schema_raw = archive.read(UnzipPBIP.SCHEMA_MEMBER)
+        layout_raw = archive.read(UnzipPBIP.LAYOUT_MEMBER)
+    if schema_raw is None:
+        raise SystemExit(f"DataModelSchema introuvable dans {pbit_path}")
+    model = run_model_branch(schema_raw)
+    layout = run_layout_branch(layout_raw)
+    return usage.UsageIndex(model, layout['usages'] or ())
+
+def _unused_worker(pbit_path: Path):
+    """Objets inutilisés d'un .pbit, dans un processus du pool ; retourne (résultat, erreur)."""
+    try:
+        return analyze_usage(pbit_path).unused(), None
+    except (Exception, SystemExit) as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def run_unused(sources, workers=None):
+    """
+    Objets inutilisés de tous les .pbit désignés par sources, sur un ProcessPoolExecutor.
+    Retourne {chemin: {'measures': [...], 'columns': [...]} ou {'error': message}}.
+    """
+    pbit_files = expand_sources(sources)
+    results = {}
+    if not pbit_files:
+        print("Aucun fichier .pbit à analyser.")
+        return results
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for pbit_path, (unused, error) in zip(pbit_files, executor.map(_unused_worker, pbit_files)):
+            results[str(pbit_path)] = {'error': error} if error else unused
+    return results
+
+def expand_sources(sources):
+    """Liste dédoublonnée des .pbit désignés par des dossiers, des fichiers ou des motifs glob."""
+    found = []
+    for source in sources:
+        path = Path(source)
+        if path.is_dir():
+            found.extend(sorted(path.glob('*.pbit')))
+        elif path.is_file():
+            found.append(path)
+        else:
+            found.extend(Path(p) for p in sorted(glob.glob(str(source), recursive=True)) if p.lower().endswith('.pbit'))
+    unique = []
+    seen = set()
+    for path in found:
+        resolved = path.resolve()
+        if resolved not in seen:
+            seen.add(resolved)
+            unique.append(resolved)
+    return unique
+
+def batch_output_paths(pbit_files, output_dir: Path = None):
+    """
+    Chemin du document de chaque .pbit : <nom du .pbit>.docx dans output_dir (ou à
+    côté du .pbit). Quand plusieurs rapports du même nom aboutissent dans le même
+    dossier, leur nom reprend le chemin relatif à leur dossier commun
+    (x/Sales.pbit → x_Sales.docx), puis un numéro si le nom est encore pris.
+    """
+    groups = {}
+    for pbit_path in pbit_files:
+        directory = Path(output_dir) if output_dir is not None else pbit_path.parent
+        groups.setdefault((directory, pbit_path.stem.lower()), []).append(pbit_path)
+
+    paths = {}
+    taken = set()
+    for (directory, _), group in groups.items():
+        if len(group) == 1:
+            names = [group[0].stem]
+        else:
+            root = Path(os.path.commonpath([p.parent for p in group]))
+            names = ['_'.join(p.relative_to(root).with_suffix('').parts) for p in group]
+        for pbit_path, name in zip(group, names):
+            candidate, n = name, 1
+            while (directory, candidate.lower()) in taken:
+                n += 1
+                candidate = f"{name}_{n}"
+            taken.add((directory, candidate.lower()))
+            paths[pbit_path] = directory / f"{candidate}.docx"
+    return paths
+
+def _batch_worker(pbit_path: Path, output_path: Path, debug_json, cache, stream, formats, metrics_path, profile_dir,
+                  catalog_path=None):
+    """Documente un .pbit dans un processus du pool ; retourne (durées, erreur)."""
+    try:
+        return document_pbit(pbit_path, output_path, debug_json=debug_json, cache=cache,
+                             debug_prefix=f"{output_path.stem}_", stream=stream, formats=formats,
+                             metrics_path=metrics_path, profile_dir=profile_dir, catalog_path=catalog_path), None
+    except (Exception, SystemExit) as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def run_batch(sources, output_dir: Path = None, workers=None, debug_json=None, cache: ResultCache = None,
+              stream=False, formats=('docx',), metrics_path: Path = None, profile_dir: Path = None,
+              catalog_path: Path = None):
+    """
+    Documente tous les .pbit désignés par sources sur un ProcessPoolExecutor.
+    Chaque rapport produit <nom du .pbit>.docx dans output_dir (ou à côté du .pbit),
+    sous un nom propre à chacun (voir batch_output_paths).
+    Retourne un résumé : rapports traités, échecs, débit.
+    """
+    pbit_files = expand_sources(sources)
+    if not pbit_files:
+        print("Aucun fichier .pbit à documenter.")
+        return {'reports': 0, 'succeeded': 0, 'failed': {}, 'seconds': 0.0, 'bytes': 0}
+    if output_dir is not None:
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+    start = time.time()
+    failed = {}
+    total_bytes = 0
+    output_paths = batch_output_paths(pbit_files, output_dir)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for pbit_path in pbit_files:
+            output_path = output_paths[pbit_path]
+            future = executor.submit(_batch_worker, pbit_path, output_path, debug_json, cache, stream, formats,
+                                     metrics_path, profile_dir, catalog_path)
+            futures[future] = pbit_path
+        for future in as_completed(futures):
+            pbit_path = futures[future]
+            try:
+                _, error = future.result()
+            except Exception as e:
+                # Processus du pool interrompu (mémoire, signal…)
+                error = f"{type(e).__name__}: {e}"
+            if error:
+                failed[str(pbit_path)] = error
+                print(f"❌ {pbit_path.name} : {error}")
+            else:
+                total_bytes += pbit_path.stat().st_size
+                print(f"✅ {pbit_path.name} documenté → {output_paths[pbit_path].name}")
+
+    return {
+        'reports': len(pbit_files),
+        'succeeded': len(pbit_files) - len(failed),
+        'failed': failed,
+        'seconds': time.time() - start,
+        'bytes': total_bytes,
+    }
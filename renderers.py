@@ -0,0 +1,181 @@
+import html
+import itertools
+from pathlib import Path
+
+import autodoc
+import lineage
+from usage import iter_unused_blocks
+from EncodeJSON import dumps
+from docx_stream import StreamingDocxWriter, iter_parallel_sections
+
+# Extension du fichier produit par chaque format
+FORMAT_SUFFIXES = {'docx': '.docx', 'md': '.md', 'html': '.html', 'json': '.json'}
+
+
+def _graph(model, usage):
+    """Graphe de dépendances : celui de l'index d'utilisation s'il y en a un."""
+    return usage.graph if usage is not None else lineage.build_graph(model)
+
+def iter_sections(model, pages, usage=None, sections=None):
+    """
+    Sections du document complet, dans l'ordre, chacune sous forme de blocs : modèle,
+    lignage, objets inutilisés (avec un index d'utilisation, voir usage.UsageIndex)
+    puis, s'il y en a, visibilité des pages.
+    sections remplace les blocs des tables usuelles (voir autodoc.iter_model_blocks).
+    """
+    yield autodoc.iter_model_blocks(model, sections)
+    yield lineage.iter_lineage_blocks(_graph(model, usage))
+    if usage is not None:
+        yield iter_unused_blocks(usage)
+    if pages:
+        yield autodoc.iter_pages_blocks(pages)
+
+def iter_blocks(model, pages, usage=None, sections=None):
+    """Blocs du document complet (voir iter_sections)."""
+    return itertools.chain.from_iterable(iter_sections(model, pages, usage, sections))
+
+def write_chunks(chunks, output_path: Path):
+    """Écrit au fil de l'eau les morceaux de texte produits par un moteur de rendu."""
+    with open(output_path, 'w', encoding='utf-8', newline='\n') as f:
+        for chunk in chunks:
+            f.write(chunk)
+
+
+# ——— Markdown ———
+def _md_cell(value, code):
+    text = html.escape(str(value), quote=False).replace('|', '\\|')
+    lines = text.split('\n')
+    if code:
+        return '<br>'.join(f'<code>{line}</code>' if line else '' for line in lines)
+    return '<br>'.join(lines)
+
+def iter_markdown(blocks):
+    """Rend les blocs en Markdown (tables GitHub, expressions en <code>)."""
+    for block in blocks:
+        kind = block[0]
+        if kind == 'heading':
+            yield f"{'#' * (block[2] + 1)} {block[1]}\n\n"
+        elif kind == 'paragraph':
+            if block[1]:
+                yield f"**{block[1]}**\n\n" if block[2] else f"{block[1]}\n\n"
+        elif kind == 'table':
+            headers, rows, code_columns = block[1], block[2], block[3]
+            yield '| ' + ' | '.join(_md_cell(h, False) for h in headers) + ' |\n'
+            yield '|' + '---|' * len(headers) + '\n'
+            for row in rows:
+                yield '| ' + ' | '.join(_md_cell(v, i in code_columns) for i, v in enumerate(row)) + ' |\n'
+            yield '\n'
+        elif kind == 'page_break':
+            yield '---\n\n'
+
+
+# ——— HTML statique ———
+HTML_HEAD = """<!DOCTYPE html>
+<html lang="fr">
+<head>
+<meta charset="utf-8">
+<title>Documentation automatique du modèle Power BI</title>
+<style>
+body { font-family: Calibri, Arial, sans-serif; margin: 2em; }
+table { border-collapse: collapse; margin-bottom: 1em; width: 100%; }
+th, td { border: 1px solid #000; padding: 2px 6px; vertical-align: top; font-size: 10pt; }
+th { background: #FF0000; color: #FFF; font-size: 11pt; text-align: left; }
+tr:nth-child(odd) td { background: #F2F2F2; }
+td pre { font-family: Consolas, monospace; font-size: 9pt; margin: 0; white-space: pre-wrap; }
+p.quote { font-style: italic; color: #4F81BD; font-weight: bold; }
+</style>
+</head>
+<body>
+"""
+HTML_TAIL = "</body>\n</html>\n"
+
+def iter_html(blocks):
+    """Rend les blocs en une page HTML statique autonome (style proche du document Word)."""
+    yield HTML_HEAD
+    for block in blocks:
+        kind = block[0]
+        if kind == 'heading':
+            level = block[2] + 1
+            yield f"<h{level}>{html.escape(block[1])}</h{level}>\n"
+        elif kind == 'paragraph':
+            if block[1]:
+                css = ' class="quote"' if block[2] else ''
+                yield f"<p{css}>{html.escape(block[1])}</p>\n"
+        elif kind == 'table':
+            headers, rows, code_columns = block[1], block[2], block[3]
+            yield '<table>\n<tr>' + ''.join(f"<th>{html.escape(str(h))}</th>" for h in headers) + '</tr>\n'
+            for row in rows:
+                cells = []
+                for i, value in enumerate(row):
+                    text = html.escape(str(value))
+                    cells.append(f"<td><pre>{text}</pre></td>" if i in code_columns else f"<td>{text}</td>")
+                yield '<tr>' + ''.join(cells) + '</tr>\n'
+            yield '</table>\n'
+        elif kind == 'page_break':
+            yield '<hr>\n'
+    yield HTML_TAIL
+
+
+# ——— JSON ———
+def iter_json(model, pages, usage=None):
+    """Rend le Model (voir Model.to_dict), son lignage, l'utilisation des objets et les pages en JSON."""
+    yield '{"calc_tables": ' + dumps([c.to_dict() for c in model.calc_tables]) + ',\n"tables": ['
+    for idx, tbl in enumerate(model.tables):
+        yield ('\n' if idx == 0 else ',\n') + dumps(tbl.to_dict())
+    yield '\n],\n"lineage": ' + dumps(lineage.lineage_to_dict(_graph(model, usage)))
+    if usage is not None:
+        yield ',\n"usage": ' + dumps(usage.to_dict())
+    yield ',\n"pages": ' + dumps(pages) + '}\n'
+
+
+# ——— Moteurs ———
+def render_docx(model, pages, output_path: Path, stream=False, usage=None, workers=None):
+    """
+    Avec workers (> 1), les sections des tables sont construites en XML dans un pool
+    de processus (voir docx_stream.iter_parallel_sections) et écrites telles quelles,
+    dans l'ordre du modèle, par l'écriture en flux : elles ne sont pas réanalysées
+    dans un arbre python-docx.
+    """
+    sections = None
+    if workers and workers > 1 and len(model.tables) > 1:
+        sections = iter_parallel_sections(model.tables, workers)
+        stream = True
+    # Un seul document, écrit une seule fois : en flux, ou assemblé en mémoire puis enregistré
+    builder = StreamingDocxWriter(output_path) if stream else autodoc.DocumentBuilder(output_path)
+    with builder:
+        for blocks in iter_sections(model, pages, usage, sections):
+            builder.write_blocks(blocks)
+    print(f"Documentation Word générée{' (écriture en flux)' if stream else ''} : {output_path}")
+
+def render_markdown(model, pages, output_path: Path, stream=False, usage=None):
+    write_chunks(iter_markdown(iter_blocks(model, pages, usage)), output_path)
+    print(f"Documentation Markdown générée : {output_path}")
+
+def render_html(model, pages, output_path: Path, stream=False, usage=None):
+    write_chunks(iter_html(iter_blocks(model, pages, usage)), output_path)
+    print(f"Documentation HTML générée : {output_path}")
+
+def render_json(model, pages, output_path: Path, stream=False, usage=None):
+    write_chunks(iter_json(model, pages, usage), output_path)
+    print(f"Documentation JSON générée : {output_path}")
+
+RENDERERS = {
+    'docx': render_docx,
+    'md': render_markdown,
+    'html': render_html,
+    'json': render_json,
+}
+
+def output_path_for(output_path: Path, fmt):
+    """Chemin de sortie d'un format : même nom que le document principal, extension du format."""
+    return Path(output_path).with_suffix(FORMAT_SUFFIXES[fmt])
+
+def render(fmt, model, pages, output_path: Path, stream=False, usage=None, workers=None):
+    """
+    Rend la documentation dans le format demandé ('docx', 'md', 'html' ou 'json').
+    workers ne concerne que le .docx (rendu parallèle des sections de tables).
+    """
+    if fmt == 'docx':
+        render_docx(model, pages, output_path, stream=stream, usage=usage, workers=workers)
+    else:
+        RENDERERS[fmt](model, pages, output_path, stream=stream, usage=usage)
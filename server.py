@@ -0,0 +1,392 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import renderers
+from EncodeJSON import dumps
+from cache import TOOL_VERSION
+from pipeline import document_pbit
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# Au-delà, les nouvelles demandes sont refusées (503) plutôt que mises en attente
+DEFAULT_MAX_QUEUE = 32
+DEFAULT_MAX_UPLOAD_MB = 512
+# Documents rendus conservés pour être resservis ; au-delà, les plus anciens sont supprimés
+DEFAULT_MAX_DOCUMENTS = 64
+# Taille des blocs lus (téléversement) et envoyés (document)
+CHUNK_SIZE = 1024 * 1024
+# Nombre de latences conservées pour les percentiles de /metrics
+LATENCY_WINDOW = 1000
+
+CONTENT_TYPES = {
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'md': 'text/markdown; charset=utf-8',
+    'html': 'text/html; charset=utf-8',
+    'json': 'application/json',
+}
+
+UPLOAD_PAGE = """<!doctype html>
+<html lang="fr"><head><meta charset="utf-8"><title>Documentation Power BI</title></head>
+<body style="font-family: Calibri, sans-serif; max-width: 40em; margin: 3em auto">
+<h1>Documentation Power BI</h1>
+<p><input type="file" id="pbit" accept=".pbit"> <select id="format">%s</select>
+<button onclick="send()">Documenter</button></p><p id="status"></p>
+<script>
+async function send() {
+  const file = document.getElementById('pbit').files[0];
+  const format = document.getElementById('format').value;
+  if (!file) return;
+  document.getElementById('status').textContent = 'Génération en cours…';
+  const response = await fetch('/document?format=' + format, {method: 'POST', body: file});
+  if (!response.ok) {
+    document.getElementById('status').textContent = 'Erreur : ' + await response.text();
+    return;
+  }
+  const link = document.createElement('a');
+  link.href = URL.createObjectURL(await response.blob());
+  link.download = file.name.replace(/\\.pbit$/i, '') + '.' + format;
+  link.click();
+  document.getElementById('status').textContent = 'Terminé.';
+}
+</script></body></html>
+"""
+
+
+def _render_job(pbit_path: Path, output_path: Path, fmt, cache):
+    """Documente un .pbit téléversé dans un processus du pool ; retourne (chemin du document, erreur)."""
+    try:
+        document_pbit(pbit_path, output_path, cache=cache, formats=(fmt,))
+        return str(renderers.output_path_for(output_path, fmt)), None
+    except (Exception, SystemExit) as e:
+        return None, f"{type(e).__name__}: {e}"
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))], 4)
+
+
+class DocumentationService:
+    """
+    Service de documentation : les .pbit téléversés sont rendus sur un pool de
+    processus borné. Les demandes identiques (même contenu et même format) sont
+    regroupées : un seul rendu, partagé par toutes les demandes en cours, puis
+    resservi depuis le dossier de travail. Seuls les max_documents derniers
+    documents utilisés y sont gardés. Tient les compteurs de /metrics.
+    """
+
+    def __init__(self, work_dir: Path = None, workers=None, max_queue=DEFAULT_MAX_QUEUE, cache=None,
+                 max_documents=DEFAULT_MAX_DOCUMENTS):
+        self._temporary = work_dir is None
+        self.work_dir = Path(work_dir) if work_dir else Path(tempfile.mkdtemp(prefix='autodoc_pbi_'))
+        (self.work_dir / 'uploads').mkdir(parents=True, exist_ok=True)
+        (self.work_dir / 'outputs').mkdir(parents=True, exist_ok=True)
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self.max_documents = max_documents
+        self.cache = cache
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._inflight = {}     # clé → Future du rendu en cours
+        self._done = OrderedDict()  # clé → chemin du document déjà rendu, du moins au plus récemment utilisé
+        self.counters = {'requests': 0, 'renders': 0, 'coalesced': 0, 'reused': 0, 'rejected': 0, 'errors': 0,
+                         'evicted': 0}
+        self.request_latencies = deque(maxlen=LATENCY_WINDOW)
+        self.render_latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        if self._temporary:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+    def is_full(self):
+        """File pleine : à vérifier avant de recevoir le fichier, pour refuser sans le lire."""
+        with self._lock:
+            full = len(self._inflight) >= self.max_queue
+            if full:
+                self.counters['rejected'] += 1
+            return full
+
+    def restart_pool(self, executor):
+        """
+        Remplace le pool de processus s'il est cassé (processus de rendu tué, par
+        exemple faute de mémoire) ; les rendus qu'il portait ont échoué.
+        """
+        with self._lock:
+            self._restart_pool(executor)
+
+    def _restart_pool(self, executor):
+        if self.executor is executor:
+            print("⚠️ Pool de rendu interrompu : redémarrage")
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def count_request(self):
+        with self._lock:
+            self.counters['requests'] += 1
+
+    def store_upload(self, stream, length):
+        """
+        Enregistre le corps de la requête dans un fichier propre à la demande, en le
+        hachant au fil de l'eau ; retourne (empreinte, chemin). Le fichier est à
+        supprimer (discard_upload) une fois la demande traitée.
+        """
+        sha = hashlib.sha256()
+        fd, path = tempfile.mkstemp(dir=self.work_dir / 'uploads', suffix='.pbit')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                remaining = length
+                while remaining > 0:
+                    chunk = stream.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise ConnectionError("Téléversement interrompu")
+                    sha.update(chunk)
+                    f.write(chunk)
+                    remaining -= len(chunk)
+        except BaseException:
+            self.discard_upload(path)
+            raise
+        return sha.hexdigest(), Path(path)
+
+    @staticmethod
+    def discard_upload(path):
+        Path(path).unlink(missing_ok=True)
+
+    def submit(self, digest, pbit_path, fmt):
+        """
+        Future du rendu de ce contenu dans ce format : rendu déjà fait, rendu en
+        cours (regroupement), ou nouveau rendu. Retourne None si la file est pleine.
+        """
+        key = f"{TOOL_VERSION}-{digest}-{fmt}"
+        with self._lock:
+            done = self._done.get(key)
+            if done is not None and Path(done).is_file():
+                self._done.move_to_end(key)
+                self.counters['reused'] += 1
+                return _completed(done)
+            future = self._inflight.get(key)
+            if future is not None:
+                self.counters['coalesced'] += 1
+                return future
+            if len(self._inflight) >= self.max_queue:
+                self.counters['rejected'] += 1
+                return None
+            output_dir = self.work_dir / 'outputs' / key
+            output_dir.mkdir(parents=True, exist_ok=True)
+            start = time.perf_counter()
+            args = (_render_job, pbit_path, output_dir / 'documentation.docx', fmt, self.cache)
+            try:
+                future = self.executor.submit(*args)
+            except BrokenProcessPool:
+                self._restart_pool(self.executor)
+                future = self.executor.submit(*args)
+            future.executor = self.executor
+            self._inflight[key] = future
+            self.counters['renders'] += 1
+        future.add_done_callback(lambda f: self._finished(key, f, start))
+        return future
+
+    def _finished(self, key, future, start):
+        with self._lock:
+            self._inflight.pop(key, None)
+            self.render_latencies.append(time.perf_counter() - start)
+            if not future.cancelled() and future.exception() is None and future.result()[1] is None:
+                self._done[key] = future.result()[0]
+                self._evict()
+            else:
+                # Rendu échoué : rien à resservir
+                shutil.rmtree(self.work_dir / 'outputs' / key, ignore_errors=True)
+
+    def _evict(self):
+        """Supprime les documents les moins récemment utilisés au-delà de max_documents (verrou tenu)."""
+        while len(self._done) > self.max_documents:
+            key, _ = self._done.popitem(last=False)
+            shutil.rmtree(self.work_dir / 'outputs' / key, ignore_errors=True)
+            self.counters['evicted'] += 1
+
+    def record_request(self, seconds, failed=False):
+        with self._lock:
+            self.request_latencies.append(seconds)
+            if failed:
+                self.counters['errors'] += 1
+
+    def metrics(self):
+        """Profondeur de file, compteurs et latences (secondes) pour /metrics."""
+        with self._lock:
+            requests = list(self.request_latencies)
+            renders = list(self.render_latencies)
+            return {
+                'uptime_s': round(time.time() - self.started, 1),
+                'workers': self.workers,
+                'queue_depth': len(self._inflight),
+                'max_queue': self.max_queue,
+                'documents': len(self._done),
+                **self.counters,
+                'request_latency_s': {'count': len(requests), 'p50': _percentile(requests, 0.5),
+                                      'p95': _percentile(requests, 0.95), 'max': _percentile(requests, 1.0)},
+                'render_latency_s': {'count': len(renders), 'p50': _percentile(renders, 0.5),
+                                     'p95': _percentile(renders, 0.95), 'max': _percentile(renders, 1.0)},
+            }
+
+
+def _completed(path):
+    """Future déjà résolu, pour un document rendu précédemment."""
+    future = Future()
+    future.set_result((path, None))
+    return future
+
+
+class DocumentationHandler(BaseHTTPRequestHandler):
+    """
+    GET  /          page de téléversement
+    POST /document  corps : le .pbit ; ?format=docx|md|html|json ; réponse : le document, envoyé en flux
+    GET  /metrics   profondeur de file, compteurs et latences (JSON)
+    GET  /health    « ok »
+    """
+
+    server_version = 'AutoDocPBI'
+    max_upload = DEFAULT_MAX_UPLOAD_MB * 1024 * 1024
+
+    @property
+    def service(self) -> DocumentationService:
+        return self.server.service
+
+    def _send_text(self, status, text, content_type='text/plain; charset=utf-8', headers=()):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/':
+            options = ''.join(f'<option value="{fmt}">{fmt}</option>' for fmt in renderers.RENDERERS)
+            self._send_text(HTTPStatus.OK, UPLOAD_PAGE % options, 'text/html; charset=utf-8')
+        elif path == '/metrics':
+            self._send_text(HTTPStatus.OK, dumps(self.service.metrics()), 'application/json')
+        elif path == '/health':
+            self._send_text(HTTPStatus.OK, 'ok')
+        else:
+            self._send_text(HTTPStatus.NOT_FOUND, "Ressource inconnue")
+
+    def do_POST(self):
+        start = time.perf_counter()
+        url = urlparse(self.path)
+        if url.path != '/document':
+            self._send_text(HTTPStatus.NOT_FOUND, "Ressource inconnue")
+            return
+        self.service.count_request()
+        status = self._document(parse_qs(url.query).get('format', ['docx'])[0])
+        self.service.record_request(time.perf_counter() - start, failed=status >= 400)
+
+    def _document(self, fmt):
+        """Traite une demande de documentation ; retourne le code HTTP envoyé."""
+        if fmt not in renderers.RENDERERS:
+            self._send_text(HTTPStatus.BAD_REQUEST, f"Format inconnu : {fmt} (choix : {', '.join(renderers.RENDERERS)})")
+            return HTTPStatus.BAD_REQUEST
+        length = self.headers.get('Content-Length')
+        if length is None:
+            self._send_text(HTTPStatus.LENGTH_REQUIRED, "En-tête Content-Length requis")
+            return HTTPStatus.LENGTH_REQUIRED
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length <= 0:
+            self._send_text(HTTPStatus.BAD_REQUEST, "Corps de requête vide ou Content-Length invalide")
+            return HTTPStatus.BAD_REQUEST
+        if length > self.max_upload:
+            self._send_text(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Fichier trop volumineux ({length} octets)")
+            return HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+
+        if self.service.is_full():
+            # Refus avant la lecture du corps : la connexion est fermée après la réponse
+            self.close_connection = True
+            return self._queue_full()
+
+        digest, pbit_path = self.service.store_upload(self.rfile, length)
+        try:
+            # Un document resservi peut être supprimé (voir DocumentationService._evict)
+            # avant d'être ouvert : il est alors rendu à nouveau
+            for _ in range(2):
+                future = self.service.submit(digest, pbit_path, fmt)
+                if future is None:
+                    return self._queue_full()
+                try:
+                    output, error = future.result()
+                except BrokenProcessPool:
+                    self.service.restart_pool(getattr(future, 'executor', None))
+                    self._send_text(HTTPStatus.SERVICE_UNAVAILABLE, "Processus de rendu interrompu, réessayez plus tard",
+                                    headers=[('Retry-After', '5')])
+                    return HTTPStatus.SERVICE_UNAVAILABLE
+                except Exception as e:
+                    self._send_text(HTTPStatus.INTERNAL_SERVER_ERROR, f"{type(e).__name__}: {e}")
+                    return HTTPStatus.INTERNAL_SERVER_ERROR
+                if error is not None:
+                    self._send_text(HTTPStatus.UNPROCESSABLE_ENTITY, error)
+                    return HTTPStatus.UNPROCESSABLE_ENTITY
+                try:
+                    document = open(output, 'rb')
+                    break
+                except FileNotFoundError:
+                    continue
+            else:
+                self._send_text(HTTPStatus.SERVICE_UNAVAILABLE, "Document indisponible, réessayez plus tard",
+                                headers=[('Retry-After', '1')])
+                return HTTPStatus.SERVICE_UNAVAILABLE
+        finally:
+            # Le rendu qui lisait ce fichier est terminé (ou n'a pas eu lieu)
+            self.service.discard_upload(pbit_path)
+
+        # Envoi du document en flux, bloc par bloc
+        with document:
+            self.send_response(HTTPStatus.OK)
+            self.send_header('Content-Type', CONTENT_TYPES[fmt])
+            self.send_header('Content-Length', str(os.fstat(document.fileno()).st_size))
+            self.send_header('Content-Disposition', f'attachment; filename="documentation.{fmt}"')
+            self.send_header('X-Content-SHA256', digest)
+            self.end_headers()
+            shutil.copyfileobj(document, self.wfile, CHUNK_SIZE)
+        return HTTPStatus.OK
+
+    def _queue_full(self):
+        self._send_text(HTTPStatus.SERVICE_UNAVAILABLE, "File d'attente pleine, réessayez plus tard",
+                        headers=[('Retry-After', '5')])
+        return HTTPStatus.SERVICE_UNAVAILABLE
+
+    def log_message(self, format, *args):
+        print(f"🌐 {self.address_string()} {format % args}")
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=None, work_dir: Path = None, max_queue=DEFAULT_MAX_QUEUE,
+          max_upload_mb=DEFAULT_MAX_UPLOAD_MB, cache=None, max_documents=DEFAULT_MAX_DOCUMENTS):
+    """Lance le service de documentation jusqu'à Ctrl+C (voir DocumentationHandler pour les routes)."""
+    service = DocumentationService(work_dir, workers, max_queue, cache, max_documents)
+    handler = type('Handler', (DocumentationHandler,), {'max_upload': max_upload_mb * 1024 * 1024})
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.service = service
+    print(f"🚀 Service de documentation sur http://{host}:{httpd.server_port} ({service.workers} processus)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️ Service arrêté")
+    finally:
+        httpd.server_close()
+        service.close()
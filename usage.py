@@ -0,0 +1,131 @@
+from collections import deque
+
+import lineage
+from lineage import label
+
+# Rôle des références d'un objet du modèle par un autre (voir lineage)
+DEPENDENCY_ROLE = 'dépendance'
+# Types de colonnes techniques, jamais signalées comme inutilisées
+IGNORED_COLUMN_TYPES = ('rowNumber',)
+
+
+class UsageIndex:
+    """
+    Index inversé : objet du modèle (nœud de lineage : ('measure', table, nom),
+    ('column', table, nom) ou ('table', '', nom)) → liste des emplacements qui
+    l'utilisent, sous la forme (rôle, page, visuel ou objet).
+    Construit en un seul passage sur les champs du Layout (voir
+    LayoutFinder.extract_field_usages), les relations, les hiérarchies et le
+    graphe de dépendances DAX.
+    """
+
+    def __init__(self, model, field_usages=(), graph=None):
+        self.model = model
+        self.graph = graph if graph is not None else lineage.build_graph(model)
+        self.locations = {}
+
+        # Rapport : projections et filtres des visuels, filtres de page et de rapport
+        for table, field, kind, page, visual, role in field_usages:
+            self._add(self._field_node(table, field, kind), (role, page, visual))
+            self._add(('table', '', table), (role, page, visual))
+
+        # Modèle : relations et hiérarchies
+        for rel in model.relationships:
+            self._add(('column', rel.from_table, rel.from_column), ('relation', '', rel.name or ''))
+            self._add(('column', rel.to_table, rel.to_column), ('relation', '', rel.name or ''))
+        for tbl in model.tables:
+            for hier in tbl.hierarchies:
+                for column in hier.columns or hier.levels:
+                    self._add(('column', tbl.name, column), ('hiérarchie', '', hier.name))
+
+        # Références d'un objet par un autre (mesures, colonnes et tables calculées)
+        for node, dependencies in self.graph.depends_on.items():
+            for dependency in dependencies:
+                self._add(dependency, (DEPENDENCY_ROLE, '', label(node)))
+
+    def _add(self, node, location):
+        self.locations.setdefault(node, []).append(location)
+
+    def _field_node(self, table, field, kind):
+        """Nœud d'un champ du Layout : une mesure, sinon une colonne de la table."""
+        if kind == 'Measure':
+            tbl, measure = self.model.measure(field, table)
+            if measure is None:
+                tbl, measure = self.model.measure(field)
+            if measure is not None:
+                return ('measure', tbl.name, field)
+        return ('column', table, field)
+
+    def usages(self, node):
+        """Emplacements qui utilisent node (liste vide s'il n'est utilisé nulle part)."""
+        return self.locations.get(node, [])
+
+    def used_objects(self):
+        """
+        Objets réellement utilisés : ceux que le rapport, les relations ou les
+        hiérarchies référencent, les tables calculées, et tout ce dont ils dépendent
+        (parcours du graphe, chaque arête au plus une fois). Une mesure qui n'est
+        utilisée que par des mesures inutilisées est donc elle-même inutilisée.
+        """
+        seeds = [
+            node for node, locations in self.locations.items()
+            if any(role != DEPENDENCY_ROLE for role, _, _ in locations)
+        ]
+        seeds.extend(('table', '', calc.name) for calc in self.model.calc_tables)
+        used = set(seeds)
+        queue = deque(seeds)
+        while queue:
+            node = queue.popleft()
+            dependencies = list(self.graph.depends_on.get(node, ()))
+            # Une colonne triée par une autre colonne a besoin de celle-ci
+            if node[0] == 'column':
+                tbl = self.model.table(node[1])
+                column = tbl.column(node[2]) if tbl is not None else None
+                if column is not None and column.sort_by:
+                    dependencies.append(('column', node[1], column.sort_by))
+            for dependency in dependencies:
+                if dependency not in used:
+                    used.add(dependency)
+                    queue.append(dependency)
+        return used
+
+    def unused(self):
+        """Mesures et colonnes inutilisées : {'measures': [(table, nom)], 'columns': [(table, nom)]}."""
+        used = self.used_objects()
+        measures = [
+            (tbl.name, m.name) for tbl, m in self.model.measures()
+            if ('measure', tbl.name, m.name) not in used
+        ]
+        columns = [
+            (tbl.name, col.name) for tbl in self.model.tables for col in tbl.columns
+            if col.type not in IGNORED_COLUMN_TYPES and ('column', tbl.name, col.name) not in used
+        ]
+        return {'measures': measures, 'columns': columns}
+
+    def to_dict(self):
+        """Forme sérialisable : objets inutilisés et emplacements de chaque objet utilisé."""
+        unused = self.unused()
+        return {
+            'unused_measures': [label(('measure', t, n)) for t, n in unused['measures']],
+            'unused_columns': [label(('column', t, n)) for t, n in unused['columns']],
+            'usages': [
+                {'object': label(node), 'kind': node[0],
+                 'used_by': [{'role': role, 'page': page, 'source': source} for role, page, source in locations]}
+                for node, locations in self.locations.items()
+            ],
+        }
+
+
+def iter_unused_blocks(index):
+    """Blocs de la section « Objets inutilisés »."""
+    unused = index.unused()
+    yield ('heading', 'Objets inutilisés', 1)
+    yield ('paragraph',
+           f"{len(unused['measures'])} mesure(s) et {len(unused['columns'])} colonne(s) ne sont utilisées "
+           "ni par un visuel ou un filtre du rapport, ni par une relation ou une hiérarchie, "
+           "ni par un objet utilisé.", None)
+    rows = [(t, n, 'Mesure') for t, n in unused['measures']]
+    rows += [(t, n, 'Colonne') for t, n in unused['columns']]
+    if rows:
+        yield ('table', ['Table', 'Objet', 'Type'], rows, ())
+    yield ('paragraph', '', None)
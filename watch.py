@@ -0,0 +1,107 @@
+import time
+from pathlib import Path
+
+from cache import MemoryCache
+from pipeline import batch_output_paths, document_pbit, expand_sources
+
+# Intervalle de scrutation par défaut, en secondes
+DEFAULT_INTERVAL = 0.2
+# Délai avant de relire l'état d'un fichier modifié, pour vérifier que l'enregistrement est terminé
+SETTLE_DELAY = 0.05
+
+
+def file_state(path: Path):
+    """(date de modification en ns, taille) du fichier, ou None s'il n'existe plus."""
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def snapshot(sources):
+    """État des .pbit désignés par sources : {chemin: (date de modification en ns, taille)}."""
+    state = {}
+    for path in expand_sources(sources):
+        stat = file_state(path)
+        if stat is not None:
+            state[path] = stat
+    return state
+
+
+class Watcher:
+    """
+    Processus résident qui surveille des .pbit (dossiers, fichiers ou motifs glob)
+    par scrutation de leur date de modification et de leur taille, et régénère la
+    documentation du seul rapport modifié. Les imports restent chargés et le
+    Model et les pages de chaque membre déjà vu sont gardés en mémoire (voir
+    cache.MemoryCache) : seul le membre dont les octets ont changé est redécodé.
+    Un fichier modifié n'est traité que si son état n'a pas changé après un court
+    délai (SETTLE_DELAY), pour ne pas lire un .pbit en cours d'enregistrement ;
+    sinon il est revu à la scrutation suivante.
+    """
+
+    def __init__(self, sources, output_dir: Path = None, interval=DEFAULT_INTERVAL, stream=False,
+                 formats=('docx',), cache=None):
+        self.sources = list(sources)
+        self.output_dir = Path(output_dir) if output_dir else None
+        self.interval = interval
+        self.stream = stream
+        self.formats = formats
+        self.cache = cache if cache is not None else MemoryCache()
+        self.known = {}      # chemin → état déjà documenté
+        self.output_paths = {}   # chemin → document produit (voir pipeline.batch_output_paths)
+
+    def output_path_for(self, pbit_path: Path):
+        """Même règle de nommage que batch : deux rapports du même nom ne s'écrasent pas."""
+        path = self.output_paths.get(pbit_path)
+        return path if path is not None else batch_output_paths([pbit_path], self.output_dir)[pbit_path]
+
+    def document(self, pbit_path: Path):
+        """Documente un rapport ; une erreur est affichée sans arrêter la surveillance."""
+        start = time.perf_counter()
+        try:
+            document_pbit(pbit_path, self.output_path_for(pbit_path), cache=self.cache,
+                          stream=self.stream, formats=self.formats)
+        except (Exception, SystemExit) as e:
+            print(f"❌ {pbit_path.name} : {type(e).__name__}: {e}")
+            return False
+        print(f"✅ {pbit_path.name} documenté en {time.perf_counter() - start:.2f} s")
+        return True
+
+    def poll(self):
+        """Une scrutation : documente les rapports modifiés et stables ; retourne leurs chemins."""
+        state = snapshot(self.sources)
+        self.output_paths = batch_output_paths(list(state), self.output_dir)
+        for path in list(self.known):
+            if path not in state:
+                print(f"🗑️ {path.name} supprimé")
+                del self.known[path]
+        modified = [(path, stat) for path, stat in state.items() if self.known.get(path) != stat]
+        if not modified:
+            return []
+        # Un seul délai pour tous les fichiers modifiés, puis vérification de leur stabilité
+        time.sleep(SETTLE_DELAY)
+        changed = []
+        for path, stat in modified:
+            if file_state(path) != stat:
+                # Enregistrement en cours : revu à la scrutation suivante
+                continue
+            # L'état est enregistré même en cas d'échec : le rapport sera retenté à sa prochaine modification
+            self.known[path] = stat
+            self.document(path)
+            changed.append(path)
+        return changed
+
+    def run(self, max_polls=None):
+        """Surveille jusqu'à Ctrl+C (ou max_polls scrutations)."""
+        if self.output_dir is not None:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+        print(f"👀 Surveillance de {', '.join(map(str, self.sources))} (toutes les {self.interval:g} s, Ctrl+C pour arrêter)")
+        polls = 0
+        try:
+            while max_polls is None or polls < max_polls:
+                self.poll()
+                polls += 1
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            print("\n⏹️ Surveillance arrêtée")